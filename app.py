@@ -1,4 +1,4 @@
-from flask import Flask, request, jsonify, session, send_from_directory
+from flask import Flask, request, jsonify, session, send_from_directory, Response, stream_with_context
 from flask_cors import CORS
 from chatbot import HealthcareBot
 import os
@@ -38,10 +38,42 @@ except Exception as e:
 sessions = {}
 ai_sessions = {}  # Separate session storage for AI doctor
 
-# Load doctor data from JSON file
-def load_doctors():
-    with open('doctor.json', 'r') as file:
-        return json.load(file)['doctors']
+# Page size for /api/doctor/appointments
+DOCTOR_APPOINTMENTS_PAGE_SIZE = 50
+DOCTOR_APPOINTMENTS_MAX_PAGE_SIZE = 200
+
+def encode_cursor(key):
+    """Encode a schedule position as an opaque cursor string"""
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+def decode_cursor(cursor, key_types):
+    """Decode a cursor produced by encode_cursor, checking its items against key_types"""
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(key, list) or len(key) != len(key_types):
+        raise ValueError("Invalid cursor")
+    for item, key_type in zip(key, key_types):
+        # bool is an int to isinstance but never part of a key
+        if not isinstance(item, key_type) or isinstance(item, bool):
+            raise ValueError("Invalid cursor")
+    return key
+
+def with_medical_history_details(appointment):
+    """Convert an appointment to its JSON shape and add its medical history file metadata"""
+    appointment_with_details = appointment.to_dict()
+    
+    # Check if the appointment has a medical history file
+    if 'medical_history_file' in appointment:
+        file_path = appointment['medical_history_file']
+        appointment_with_details['has_medical_history'] = True
+        appointment_with_details['medical_history_file_path'] = file_path
+        appointment_with_details['medical_history_filename'] = os.path.basename(file_path)
+    else:
+        appointment_with_details['has_medical_history'] = False
+    
+    return appointment_with_details
 
 # Node.js email service URL
 NODE_EMAIL_SERVICE_URL = "http://localhost:4000"
@@ -128,10 +160,14 @@ Help patients understand respiratory symptoms, diagnostic methods, and treatment
 
 # ---------------------- AI Doctor Functions ----------------------
 
-def create_specialist_agent(specialist_type):
-    """Create an LLM-based specialist agent"""
-    if specialist_type not in ai_specialists:
-        raise ValueError(f"Unknown specialist type: {specialist_type}")
+# Prompt templates of the AI specialists, built once per specialist type
+specialist_prompts = {}
+
+def specialist_prompt(specialist_type):
+    """The prompt template shared by every session with an AI specialist"""
+    prompt = specialist_prompts.get(specialist_type)
+    if prompt is not None:
+        return prompt
     
     # Create a specialist-specific prompt
     specialist_info = ai_specialists[specialist_type]
@@ -157,34 +193,45 @@ def create_specialist_agent(specialist_type):
         input_variables=["chat_history", "input"], 
         template=template
     )
+    return specialist_prompts.setdefault(specialist_type, prompt)
+
+def create_specialist_agent(specialist_type, llm=None):
+    """
+    Create an LLM-based specialist agent (on Gemini unless another chat model is given)
+    The model client and prompt are shared across sessions; only the memory is per session
+    """
+    if specialist_type not in ai_specialists:
+        raise ValueError(f"Unknown specialist type: {specialist_type}")
     
     try:
-        # Initialize the Gemini model
-        api_key = os.getenv("GOOGLE_API_KEY")
-        if not api_key:
-            logger.error("Google API key is missing")
-            raise ValueError("Google API key is not set in environment variables")
-            
-        llm = ChatGoogleGenerativeAI(
-            model="gemini-pro",
-            google_api_key=api_key,
-            temperature=0.7,
-            top_p=0.95,
-            safety_settings={
-                "HARM_CATEGORY_HATE_SPEECH": "BLOCK_NONE",
-                "HARM_CATEGORY_DANGEROUS_CONTENT": "BLOCK_NONE",
-                "HARM_CATEGORY_SEXUALLY_EXPLICIT": "BLOCK_NONE",
-                "HARM_CATEGORY_HARASSMENT": "BLOCK_NONE",
-            }
-        )
+        if llm is None:
+            # Use the pooled Gemini model
+            api_key = os.getenv("GOOGLE_API_KEY")
+            if not api_key:
+                logger.error("Google API key is missing")
+                raise ValueError("Google API key is not set in environment variables")
+                
+            llm = bot.llm_pool.get(
+                ChatGoogleGenerativeAI,
+                model="gemini-pro",
+                google_api_key=api_key,
+                temperature=0.7,
+                top_p=0.95,
+                safety_settings={
+                    "HARM_CATEGORY_HATE_SPEECH": "BLOCK_NONE",
+                    "HARM_CATEGORY_DANGEROUS_CONTENT": "BLOCK_NONE",
+                    "HARM_CATEGORY_SEXUALLY_EXPLICIT": "BLOCK_NONE",
+                    "HARM_CATEGORY_HARASSMENT": "BLOCK_NONE",
+                }
+            )
         
-        # Create a conversation memory
-        memory = ConversationBufferMemory(return_messages=True)
+        # Create a conversation memory (its key must match the prompt's history variable)
+        memory = ConversationBufferMemory(memory_key="chat_history", return_messages=True)
         
         # Create the conversation chain
         conversation_chain = ConversationChain(
             llm=llm,
-            prompt=prompt,
+            prompt=specialist_prompt(specialist_type),
             memory=memory,
             verbose=True
         )
@@ -194,6 +241,82 @@ def create_specialist_agent(specialist_type):
         logger.error(f"Error creating specialist agent: {str(e)}")
         raise
 
+def enhance_ai_message(user_message):
+    """Wrap a user message in instructions that ask the AI doctor for a comprehensive response"""
+    return f"""
+            User query: {user_message}
+            
+            Please provide a comprehensive and detailed response that includes:
+            1. A thorough analysis of the question or concern
+            2. Detailed medical information and context relevant to the query
+            3. Multiple perspectives or options when applicable
+            4. Evidence-based recommendations
+            5. Clear explanations of medical terminology
+            
+            Remember to be thorough and provide a complete analysis rather than a brief response.
+            """
+
+def ai_answer_reusable(session):
+    """
+    Whether the session's next answer may come from, or go to, the answer cache
+    Answers depend on the conversation so far and on uploaded records, so only
+    the opening question of a session without records is shared
+    """
+    return not session["medical_records"] and not session["agent"].memory.chat_memory.messages
+
+def cached_ai_answer(session, user_message, enhanced_prompt):
+    """
+    An earlier answer to a near-identical question for the session's specialist,
+    added to the session's conversation; None if there is none to reuse
+    """
+    response = bot.answer_cache.get(f"specialist:{session['specialist_type']}", user_message)
+    if response is not None:
+        session["agent"].memory.save_context({"input": enhanced_prompt}, {"response": response})
+    return response
+
+def remember_ai_answer(session, user_message, response):
+    """Keep an AI doctor's answer for similar questions to the same specialist"""
+    bot.answer_cache.put(f"specialist:{session['specialist_type']}", user_message, response)
+
+def ai_medical_record_path(session_id, original_name):
+    """Unique filename and path for a medical record uploaded to an AI session"""
+    # Ensure upload directory exists
+    os.makedirs(app.config['AI_UPLOAD_FOLDER'], exist_ok=True)
+    
+    # Create a unique filename
+    filename = f"{session_id}_{datetime.now().strftime('%Y%m%d%H%M%S')}_{original_name}"
+    return filename, os.path.join(app.config['AI_UPLOAD_FOLDER'], filename)
+
+def add_ai_medical_record(session_id, filename, original_name):
+    """Record a saved upload on its AI session and return the prompt asking for its analysis"""
+    logger.info(f"File {filename} saved successfully")
+    
+    # Update session with medical record info
+    ai_sessions[session_id]["medical_records"].append({
+        "filename": filename,
+        "original_name": original_name,
+        "uploaded_at": datetime.now().isoformat()
+    })
+    
+    # Create a more detailed prompt to generate comprehensive analysis
+    return f"""
+            I've uploaded a medical record called {original_name}. 
+            
+            Please provide a comprehensive analysis including:
+            1. A detailed review of the information in this document
+            2. Potential implications for my health condition
+            3. How this information relates to my current symptoms or condition
+            4. Any recommendations for additional tests or follow-up steps
+            5. Treatment options that might be relevant based on this information
+            
+            Please be thorough and detailed in your analysis.
+            """
+
+def sse_event(data, event=None):
+    """Format data as one Server-Sent Event"""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
 # ---------------------- Regular API Endpoints ----------------------
 
 @app.route('/api/chat', methods=['POST'])
@@ -206,16 +329,7 @@ def chat():
     if not data or 'message' not in data:
         return jsonify({'error': 'No message provided'}), 400
     
-    # Get or create session ID
-    session_id = data.get('session_id')
-    if not session_id or session_id not in sessions:
-        session_id = str(uuid.uuid4())
-        sessions[session_id] = {
-            'user_data': {},
-            'context': None,
-            'current_step': None
-        }
-    
+    session_id = get_chat_session(data.get('session_id'))
     user_message = data['message']
     session_data = sessions[session_id]
     
@@ -278,34 +392,35 @@ def chat():
             })
     
     # Process natural language input
-    if "book" in user_message.lower() and "appointment" in user_message.lower():
+    intent = chat_intent(user_message)
+    if intent == 'book':
         sessions[session_id]['context'] = 'booking_appointment'
         sessions[session_id]['current_step'] = 'name'
         return jsonify({
             'response': "Let's book an appointment. What is your full name?",
             'session_id': session_id
         })
-    elif "check" in user_message.lower() and "appointment" in user_message.lower():
+    elif intent == 'check':
         sessions[session_id]['context'] = 'checking_appointment'
         sessions[session_id]['current_step'] = 'identifier'
         return jsonify({
             'response': "Please provide your email or phone number to check your appointment:",
             'session_id': session_id
         })
-    elif "cancel" in user_message.lower() and "appointment" in user_message.lower():
+    elif intent == 'cancel':
         sessions[session_id]['context'] = 'cancelling_appointment'
         sessions[session_id]['current_step'] = 'identifier'
         return jsonify({
             'response': "Please provide your email or phone number to cancel your appointment:",
             'session_id': session_id
         })
-    elif "doctor" in user_message.lower() and ("available" in user_message.lower() or "list" in user_message.lower()):
+    elif intent == 'doctors':
         doctor_info = bot.get_doctor_info("")
         return jsonify({
             'response': doctor_info,
             'session_id': session_id
         })
-    elif "symptom" in user_message.lower() or "check symptom" in user_message.lower():
+    elif intent == 'symptoms':
         sessions[session_id]['context'] = 'checking_symptoms'
         sessions[session_id]['current_step'] = 'symptoms'
         return jsonify({
@@ -315,15 +430,68 @@ def chat():
     else:
         # Default to using the bot's AI processing
         response = bot.process_user_input(user_message)
-        
-        # Provide menu options if the user seems lost
-        if "help" in user_message.lower() or "option" in user_message.lower() or "menu" in user_message.lower():
-            response += "\n\nYou can select from the following options:\n1. Book an appointment\n2. Check my existing appointment\n3. Cancel my appointment\n4. View available doctors\n5. Check symptoms"
-        
-        return jsonify({
-            'response': response,
-            'session_id': session_id
-        })
+        return jsonify(assistant_reply(user_message, session_id, response))
+
+def get_chat_session(session_id):
+    """Return the id of the chat session, starting a new one if it doesn't exist"""
+    if not session_id or session_id not in sessions:
+        session_id = str(uuid.uuid4())
+        sessions[session_id] = {
+            'user_data': {},
+            'context': None,
+            'current_step': None
+        }
+    return session_id
+
+def chat_intent(user_message):
+    """Which flow a free-text chat message asks for, or None to leave it to the AI assistant"""
+    message = user_message.lower()
+    if "book" in message and "appointment" in message:
+        return 'book'
+    elif "check" in message and "appointment" in message:
+        return 'check'
+    elif "cancel" in message and "appointment" in message:
+        return 'cancel'
+    elif "doctor" in message and ("available" in message or "list" in message):
+        return 'doctors'
+    elif "symptom" in message:
+        return 'symptoms'
+    return None
+
+def chat_llm_step(session_id, user_message):
+    """
+    Which model call a chat message leads to: 'symptoms' for a symptom
+    assessment, 'assistant' for the AI assistant, or None if it needs none
+    An unknown session_id is treated as a new session
+    """
+    session_data = sessions.get(session_id) or {'context': None, 'current_step': None}
+    if session_data['context'] == 'checking_symptoms':
+        return 'symptoms' if session_data['current_step'] == 'symptoms' else None
+    if session_data['context'] or user_message.isdigit() or chat_intent(user_message):
+        return None
+    return 'assistant'
+
+def assistant_reply(user_message, session_id, response):
+    """The chat reply for an answer from the AI assistant"""
+    # Provide menu options if the user seems lost
+    if "help" in user_message.lower() or "option" in user_message.lower() or "menu" in user_message.lower():
+        response += "\n\nYou can select from the following options:\n1. Book an appointment\n2. Check my existing appointment\n3. Cancel my appointment\n4. View available doctors\n5. Check symptoms"
+    
+    return {
+        'response': response,
+        'session_id': session_id
+    }
+
+def offer_times(session_id, doctor_id, date):
+    """
+    The free times to offer a chat session for a doctor-day
+    Up to the inventory's per-day limit (SLOT_HOLDS_PER_DAY) of them are held
+    for the session while it chooses; the others are offered without a hold
+    and booked only if still free when picked
+    """
+    inventory = bot.slot_inventory
+    held = inventory.hold(session_id, doctor_id, date, inventory.free_times(doctor_id, date))
+    return sorted(held + inventory.free_times(doctor_id, date))
 
 def handle_booking_flow(user_message, session_id):
     """Handle the appointment booking conversation flow"""
@@ -390,7 +558,7 @@ def handle_booking_flow(user_message, session_id):
         session_data['current_step'] = 'doctor'
         
         # Get list of doctors
-        doctor_list = bot.doctors_data.get("doctors", [])
+        doctor_list = bot.doctor_registry.all()
         
         # Format doctor information with IDs for the frontend
         doctor_info = "Please select a doctor:\n\n"
@@ -431,12 +599,18 @@ def handle_booking_flow(user_message, session_id):
                 'session_id': session_id
             })
         
+        # Get the dates this doctor still has free slots on
+        available_dates = bot.slot_inventory.free_dates(doctor_id)
+        if not available_dates:
+            return jsonify({
+                'response': "Sorry, this doctor has no free slots in the coming days. Please select another doctor.",
+                'session_id': session_id
+            })
+        
         user_data['doctor'] = bot.doctors[doctor_id]
         user_data['doctor_id'] = doctor_id  # Store the actual doctor ID
         session_data['current_step'] = 'date'
         
-        # Get available dates
-        available_dates = list(bot.available_slots.keys())
         date_options = "\n".join([f"{i+1}. {date}" for i, date in enumerate(available_dates)])
         
         # Store dates for reference
@@ -454,11 +628,16 @@ def handle_booking_flow(user_message, session_id):
             
             if 0 <= date_index < len(available_dates):
                 selected_date = available_dates[date_index]
+                
+                available_times = offer_times(session_id, user_data['doctor_id'], selected_date)
+                if not available_times:
+                    return jsonify({
+                        'response': f"Sorry, {selected_date} has just been fully booked. Please select another date.",
+                        'session_id': session_id
+                    })
+                
                 user_data['appointment_date'] = selected_date
                 session_data['current_step'] = 'time'
-                
-                # Get available times for the selected date
-                available_times = bot.available_slots[selected_date]
                 time_options = "\n".join([f"{i+1}. {time}" for i, time in enumerate(available_times)])
                 
                 # Store times for reference
@@ -490,12 +669,26 @@ def handle_booking_flow(user_message, session_id):
                 selected_time = available_times[time_index]
                 user_data['appointment_time'] = selected_time
                 
-                # Remove the selected slot from available slots
-                bot.available_slots[selected_date].remove(selected_time)
-                
-                # Save the appointment
-                bot.appointments.append(user_data)
-                bot.save_data(bot.appointments, bot.data_file)
+                # Book the held slot; if the hold lapsed and it was taken, offer what is left
+                record = bot.book_appointment_slot(user_data, owner=session_id)
+                if record is None:
+                    del user_data['appointment_time']
+                    available_times = offer_times(session_id, user_data['doctor_id'], selected_date)
+                    if available_times:
+                        session_data['available_times'] = available_times
+                        options = "\n".join([f"{i+1}. {time}" for i, time in enumerate(available_times)])
+                        prompt = "Please select a time slot (enter the number):"
+                    else:
+                        available_dates = bot.slot_inventory.free_dates(user_data['doctor_id'])
+                        session_data['available_dates'] = available_dates
+                        session_data['current_step'] = 'date'
+                        options = "\n".join([f"{i+1}. {date}" for i, date in enumerate(available_dates)])
+                        prompt = "Please select a date (enter the number):"
+                    return jsonify({
+                        'response': f"Sorry, {selected_time} on {selected_date} has just been booked. "
+                                    f"Available options:\n{options}\n\n{prompt}",
+                        'session_id': session_id
+                    })
                 
                 # Set a reminder for the appointment
                 bot.set_appointment_reminder(user_data)
@@ -521,8 +714,10 @@ def handle_booking_flow(user_message, session_id):
                 summary += "You can upload your previous medical history files through the portal.\n"
                 summary += "Please arrive 15 minutes before your scheduled time."
                 
-                # Create a copy of the appointment for the response
-                appointment_data = user_data.copy()
+                # The stored appointment, with its id, for the response; the next
+                # booking in this session starts from empty details
+                appointment_data = record.to_dict()
+                session_data['user_data'] = {}
                 
                 return jsonify({
                     'response': summary,
@@ -552,22 +747,8 @@ def handle_checking_flow(user_message, session_id):
         found_appointments = []
         
         # Look for all matching appointments
-        for appointment in bot.appointments:
-            if (identifier_type == 'email' and appointment.get('email') == user_message) or \
-               (identifier_type == 'phone' and appointment.get('phone') == user_message):
-                # Include medical history file info if available
-                appointment_with_details = appointment.copy()
-                
-                # Check if the appointment has a medical history file
-                if 'medical_history_file' in appointment:
-                    file_path = appointment['medical_history_file']
-                    appointment_with_details['has_medical_history'] = True
-                    appointment_with_details['medical_history_file_path'] = file_path
-                    appointment_with_details['medical_history_filename'] = os.path.basename(file_path)
-                else:
-                    appointment_with_details['has_medical_history'] = False
-                
-                found_appointments.append(appointment_with_details)
+        for appointment in bot.find_appointments(**{identifier_type: user_message}):
+            found_appointments.append(with_medical_history_details(appointment))
         
         # Clear the context
         session_data['context'] = None
@@ -623,13 +804,9 @@ def handle_cancelling_flow(user_message, session_id):
     if session_data['current_step'] == 'identifier':
         # Check if it's an email or phone
         identifier_type = 'email' if '@' in user_message else 'phone'
-        found_appointments = []
         
         # Look for all matching appointments
-        for appointment in bot.appointments:
-            if (identifier_type == 'email' and appointment.get('email') == user_message) or \
-               (identifier_type == 'phone' and appointment.get('phone') == user_message):
-                found_appointments.append(appointment)
+        found_appointments = bot.find_appointments(**{identifier_type: user_message})
         
         # No appointments found
         if not found_appointments:
@@ -643,8 +820,7 @@ def handle_cancelling_flow(user_message, session_id):
         # Single appointment found - cancel it
         elif len(found_appointments) == 1:
             appointment = found_appointments[0]
-            bot.appointments.remove(appointment)
-            bot.save_data(bot.appointments, bot.data_file)
+            bot.remove_appointment(appointment)
             return jsonify({
                 'success': True,
                 'message': f"Appointment for {appointment['name']} has been cancelled successfully"
@@ -679,8 +855,7 @@ def handle_cancelling_flow(user_message, session_id):
             appointment = found_appointments[selection - 1]
             
             # Remove the appointment
-            bot.appointments.remove(appointment)
-            bot.save_data(bot.appointments, bot.data_file)
+            bot.remove_appointment(appointment)
             
             # Clear the context
             session_data['context'] = None
@@ -698,6 +873,34 @@ def handle_cancelling_flow(user_message, session_id):
                 'session_id': session_id
             })
 
+def symptom_assessment_reply(session_id, assessment):
+    """The chat reply for a symptom assessment, ending the symptoms flow"""
+    session_data = sessions[session_id]
+    
+    # Get recommended specialist
+    recommended_specialist = getattr(bot, 'recommended_specialist', 'General Physician')
+    
+    # Clear the context
+    session_data['context'] = None
+    session_data['current_step'] = None
+    
+    response = f"SYMPTOM ASSESSMENT:\n\n{assessment}\n\n"
+    response += f"Based on your symptoms, I recommend consulting with a {recommended_specialist}."
+    
+    # Get matching doctors
+    matching_doctors = bot.get_specialist_doctors(recommended_specialist)
+    if matching_doctors:
+        doctors_list = "\n".join([f"- {doctor}" for doctor in matching_doctors])
+        response += f"\n\nHere are doctors specializing in this area:\n{doctors_list}\n\n"
+        response += "Would you like to book an appointment with one of these doctors? Reply with '1' to start booking."
+    
+    return {
+        'response': response,
+        'session_id': session_id,
+        'assessment': assessment,
+        'recommended_specialist': recommended_specialist
+    }
+
 def handle_symptoms_flow(user_message, session_id):
     """Handle the symptoms checking conversation flow"""
     session_data = sessions[session_id]
@@ -705,30 +908,7 @@ def handle_symptoms_flow(user_message, session_id):
     if session_data['current_step'] == 'symptoms':
         # Process the symptoms
         assessment = bot.check_symptoms(user_message)
-        
-        # Get recommended specialist
-        recommended_specialist = getattr(bot, 'recommended_specialist', 'General Physician')
-        
-        # Clear the context
-        session_data['context'] = None
-        session_data['current_step'] = None
-        
-        response = f"SYMPTOM ASSESSMENT:\n\n{assessment}\n\n"
-        response += f"Based on your symptoms, I recommend consulting with a {recommended_specialist}."
-        
-        # Get matching doctors
-        matching_doctors = bot.get_specialist_doctors(recommended_specialist)
-        if matching_doctors:
-            doctors_list = "\n".join([f"- {doctor}" for doctor in matching_doctors])
-            response += f"\n\nHere are doctors specializing in this area:\n{doctors_list}\n\n"
-            response += "Would you like to book an appointment with one of these doctors? Reply with '1' to start booking."
-        
-        return jsonify({
-            'response': response,
-            'session_id': session_id,
-            'assessment': assessment,
-            'recommended_specialist': recommended_specialist
-        })
+        return jsonify(symptom_assessment_reply(session_id, assessment))
     elif session_data['current_step'] == 'book_from_symptoms' and user_message.lower() == 'yes':
         # User confirmed they want to book with the recommended doctor
         # Set the context to booking_appointment and start from the name
@@ -850,9 +1030,18 @@ def book_appointment():
         if not user_data.get(field):
             return jsonify({'error': f'Missing required field: {field}'}), 400
     
-    # Add appointment to the bot's appointments list
-    bot.appointments.append(user_data)
-    bot.save_data(bot.appointments, bot.data_file)
+    doctor_id = data.get('doctor_id') or bot.resolve_doctor(user_data)
+    if doctor_id is None or str(doctor_id) not in bot.doctors:
+        return jsonify({'error': 'Unknown doctor'}), 400
+    user_data['doctor_id'] = str(doctor_id)
+    
+    # Reserve the slot and save the appointment; a slot is only ever booked once
+    record = bot.book_appointment_slot(user_data)
+    if record is None:
+        return jsonify({
+            'error': 'This slot is no longer available',
+            'available_times': bot.slot_inventory.free_times(user_data['doctor_id'], user_data['appointment_date'])
+        }), 409
     
     # Set appointment reminder
     bot.set_appointment_reminder(user_data)
@@ -860,7 +1049,7 @@ def book_appointment():
     return jsonify({
         'success': True,
         'message': 'Appointment booked successfully',
-        'appointment': user_data
+        'appointment': record.to_dict()
     })
 
 @app.route('/api/check-appointment', methods=['POST'])
@@ -878,22 +1067,8 @@ def check_appointment():
     found_appointments = []
     
     # Look for all matching appointments
-    for appointment in bot.appointments:
-        if (email and appointment.get('email') == email) or \
-           (phone and appointment.get('phone') == phone):
-            # Include medical history file info if available
-            appointment_with_details = appointment.copy()
-            
-            # Check if the appointment has a medical history file
-            if 'medical_history_file' in appointment:
-                file_path = appointment['medical_history_file']
-                appointment_with_details['has_medical_history'] = True
-                appointment_with_details['medical_history_file_path'] = file_path
-                appointment_with_details['medical_history_filename'] = os.path.basename(file_path)
-            else:
-                appointment_with_details['has_medical_history'] = False
-            
-            found_appointments.append(appointment_with_details)
+    for appointment in bot.find_appointments(email=email, phone=phone):
+        found_appointments.append(with_medical_history_details(appointment))
     
     if found_appointments:
         return jsonify({
@@ -919,16 +1094,10 @@ def cancel_appointment():
     # Check if we have appointment_id for direct cancellation
     if 'appointment_id' in data:
         appointment_id = data.get('appointment_id')
-        appointment_to_cancel = None
-        
-        for i, appointment in enumerate(bot.appointments):
-            if str(i) == str(appointment_id):
-                appointment_to_cancel = appointment
-                break
+        appointment_to_cancel = bot.get_appointment(str(appointment_id))
                 
         if appointment_to_cancel:
-            bot.appointments.remove(appointment_to_cancel)
-            bot.save_data(bot.appointments, bot.data_file)
+            bot.remove_appointment(appointment_to_cancel)
             return jsonify({
                 'success': True,
                 'message': f"Appointment for {appointment_to_cancel['name']} has been cancelled successfully"
@@ -944,13 +1113,8 @@ def cancel_appointment():
         email = data.get('email')
         phone = data.get('phone')
     
-        found_appointments = []
-        
         # Look for all matching appointments
-        for appointment in bot.appointments:
-            if (email and appointment.get('email') == email) or \
-               (phone and appointment.get('phone') == phone):
-                found_appointments.append(appointment)
+        found_appointments = bot.find_appointments(email=email, phone=phone)
                 
         # No appointments found
         if not found_appointments:
@@ -965,14 +1129,13 @@ def cancel_appointment():
                 'success': False,
                 'message': 'Multiple appointments found. Please specify which one to cancel.',
                 'appointment_count': len(found_appointments),
-                'appointments': found_appointments
+                'appointments': [appointment.to_dict() for appointment in found_appointments]
             })
             
         # Single appointment found - cancel it
         else:
             appointment = found_appointments[0]
-            bot.appointments.remove(appointment)
-            bot.save_data(bot.appointments, bot.data_file)
+            bot.remove_appointment(appointment)
             return jsonify({
                 'success': True,
                 'message': f"Appointment for {appointment['name']} has been cancelled successfully"
@@ -980,6 +1143,42 @@ def cancel_appointment():
     else:
         return jsonify({'error': 'Email, phone, or appointment_id is required'}), 400
 
+@app.route('/api/appointments/<appointment_id>', methods=['GET'])
+def get_appointment(appointment_id):
+    """
+    Endpoint to fetch a single appointment by its id
+    """
+    appointment = bot.get_appointment(appointment_id)
+    if not appointment:
+        return jsonify({
+            'success': False,
+            'message': 'No appointment found with the provided ID'
+        }), 404
+    
+    return jsonify({
+        'success': True,
+        'appointment': with_medical_history_details(appointment)
+    })
+
+@app.route('/api/appointments/<appointment_id>', methods=['DELETE'])
+def delete_appointment(appointment_id):
+    """
+    Endpoint to cancel a single appointment by its id
+    """
+    appointment = bot.get_appointment(appointment_id)
+    if not appointment:
+        return jsonify({
+            'success': False,
+            'message': 'No appointment found with the provided ID'
+        }), 404
+    
+    bot.remove_appointment(appointment)
+    return jsonify({
+        'success': True,
+        'message': f"Appointment for {appointment['name']} has been cancelled successfully",
+        'appointment_id': appointment_id
+    })
+
 @app.route('/api/doctors', methods=['GET'])
 def get_doctors():
     """
@@ -989,13 +1188,78 @@ def get_doctors():
         'doctors': bot.doctors
     })
 
+# Serialized /api/available-slots bodies by query, each valid for one inventory generation
+available_slots_cache = {}
+AVAILABLE_SLOTS_CACHE_SIZE = 256
+# Generations restart at every startup and in every worker process, so slot
+# ETags also carry a token unique to this process
+SLOTS_ETAG_PREFIX = f"slots-{uuid.uuid4().hex[:12]}"
+
 @app.route('/api/available-slots', methods=['GET'])
 def get_available_slots():
     """
-    Endpoint to retrieve all available appointment slots
+    Endpoint to retrieve available appointment slots, for one doctor when
+    doctor_id is given or across all doctors (optionally of one specialty)
+    otherwise, within optional from/to dates. Responses carry an ETag tied
+    to this process and the slot inventory's generation, and answer 304
+    when both are unchanged.
+    """
+    doctor_id = request.args.get('doctor_id')
+    specialty = request.args.get('specialty')
+    date_from = request.args.get('from')
+    date_to = request.args.get('to')
+    if doctor_id and doctor_id not in bot.doctors:
+        return jsonify({'error': 'Doctor not found'}), 404
+    
+    # Read the generation before the slots, so a change made meanwhile can
+    # only make the body newer than its tag, never older
+    inventory = bot.slot_inventory
+    generation = inventory.generation
+    modified = inventory.modified
+    
+    key = (doctor_id, specialty, date_from, date_to)
+    cached = available_slots_cache.get(key)
+    if cached is None or cached[0] != generation:
+        if doctor_id:
+            payload = {
+                'doctor_id': doctor_id,
+                'available_slots': inventory.free_slots(doctor_id, date_from, date_to)
+            }
+        else:
+            doctor_ids = bot.doctors_with_specialty(specialty) if specialty else None
+            payload = {'available_slots': inventory.union(doctor_ids, date_from, date_to)}
+        if len(available_slots_cache) >= AVAILABLE_SLOTS_CACHE_SIZE:
+            available_slots_cache.clear()
+        cached = available_slots_cache[key] = (generation, json.dumps(payload))
+    
+    response = app.response_class(cached[1], mimetype='application/json')
+    response.set_etag(f"{SLOTS_ETAG_PREFIX}-{generation}")
+    response.last_modified = modified
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+@app.route('/api/earliest-slots', methods=['GET'])
+def get_earliest_slots():
+    """
+    Endpoint to find the soonest free slots for a specialty or set of doctors
     """
+    try:
+        limit = int(request.args.get('limit', 5))
+    except ValueError:
+        return jsonify({'error': 'limit must be a number'}), 400
+    if not 1 <= limit <= 100:
+        return jsonify({'error': 'limit must be between 1 and 100'}), 400
+    
+    doctor_ids = request.args.getlist('doctor_id') or None
+    slots = bot.find_earliest_slots(
+        specialty=request.args.get('specialty'),
+        doctor_ids=doctor_ids,
+        limit=limit,
+        date_from=request.args.get('from')
+    )
     return jsonify({
-        'available_slots': bot.available_slots
+        'slot_count': len(slots),
+        'slots': slots
     })
 
 @app.route('/api/check-symptoms', methods=['POST'])
@@ -1018,6 +1282,18 @@ def check_symptoms():
         'recommended_specialist': recommended_specialist
     })
 
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """
+    Endpoint exposing cache, LLM pool and identifier extraction statistics for monitoring
+    """
+    return jsonify({
+        'symptom_cache': bot.symptom_cache.stats(),
+        'answer_cache': bot.answer_cache.stats(),
+        'llm_pool': bot.llm_pool.stats(),
+        'identifier_extraction': bot.extraction_stats()
+    })
+
 @app.route('/api/doctor/login', methods=['POST'])
 def doctor_login():
     """
@@ -1036,11 +1312,8 @@ def doctor_login():
         doctor_id = data['doctor_id']
         password = data['password']
         
-        # Load doctors data
-        doctors = load_doctors()
-        
         # Find doctor with matching ID
-        doctor = next((doc for doc in doctors if doc['id'] == doctor_id), None)
+        doctor = bot.doctor_registry.get(doctor_id)
         
         if doctor and doctor['password'] == password:
             # Create session data (optional)
@@ -1070,6 +1343,8 @@ def doctor_login():
 def get_doctor_appointments():
     """
     Endpoint to retrieve appointments for a specific doctor
+    Accepts optional 'from'/'to' dates (YYYY-MM-DD), 'order' ('asc' or 'desc'),
+    'limit' and the 'cursor' returned as 'next_cursor' by the previous page
     """
     try:
         data = request.get_json()
@@ -1083,9 +1358,8 @@ def get_doctor_appointments():
         
         doctor_id = data['doctor_id']
         
-        # Load doctors data to verify the doctor exists
-        doctors = load_doctors()
-        doctor = next((doc for doc in doctors if doc['id'] == doctor_id), None)
+        # Verify the doctor exists
+        doctor = bot.doctor_registry.get(doctor_id)
         
         if not doctor:
             return jsonify({
@@ -1096,23 +1370,43 @@ def get_doctor_appointments():
         # Find doctor name
         doctor_name = doctor['name']
         
-        # Find appointments for this doctor
-        doctor_appointments = []
-        for appointment in bot.appointments:
-            if doctor_name in appointment.get('doctor', ''):
-                # Include medical history file info if available
-                appointment_with_details = appointment.copy()
-                
-                # Check if the appointment has a medical history file
-                if 'medical_history_file' in appointment:
-                    file_path = appointment['medical_history_file']
-                    appointment_with_details['has_medical_history'] = True
-                    appointment_with_details['medical_history_file_path'] = file_path
-                    appointment_with_details['medical_history_filename'] = os.path.basename(file_path)
-                else:
-                    appointment_with_details['has_medical_history'] = False
-                
-                doctor_appointments.append(appointment_with_details)
+        # Paging and filtering options
+        try:
+            limit = int(data.get('limit', DOCTOR_APPOINTMENTS_PAGE_SIZE))
+            if not 1 <= limit <= DOCTOR_APPOINTMENTS_MAX_PAGE_SIZE:
+                raise ValueError
+        except (TypeError, ValueError):
+            return jsonify({
+                'success': False,
+                'message': f'limit must be between 1 and {DOCTOR_APPOINTMENTS_MAX_PAGE_SIZE}'
+            }), 400
+        
+        order = data.get('order', 'asc')
+        if order not in ('asc', 'desc'):
+            return jsonify({
+                'success': False,
+                'message': "order must be 'asc' or 'desc'"
+            }), 400
+        
+        try:
+            after = (decode_cursor(data['cursor'], bot.appointment_store.schedule_key_types)
+                     if data.get('cursor') else None)
+        except ValueError:
+            return jsonify({
+                'success': False,
+                'message': 'Invalid cursor'
+            }), 400
+        
+        # Only the requested page is read from the doctor's date-ordered index
+        page, next_key = bot.get_doctor_schedule_page(
+            doctor_id,
+            date_from=data.get('from'),
+            date_to=data.get('to'),
+            after=after,
+            limit=limit,
+            descending=(order == 'desc')
+        )
+        doctor_appointments = [with_medical_history_details(appointment) for appointment in page]
         
         # Format response in a more structured way than the chatbot text output
         return jsonify({
@@ -1123,7 +1417,9 @@ def get_doctor_appointments():
                 'specialty': doctor['specialty']
             },
             'appointment_count': len(doctor_appointments),
-            'appointments': doctor_appointments
+            'appointments': doctor_appointments,
+            'next_cursor': encode_cursor(next_key) if next_key else None,
+            'has_more': next_key is not None
         })
         
     except Exception as e:
@@ -1222,7 +1518,7 @@ def upload_medical_history():
         if 'appointment_identifier' not in data or 'file_data' not in data:
             return jsonify({'error': 'Missing required fields'}), 400
             
-        # Get appointment identifier (can be email, phone or appointment index)
+        # Get appointment identifier (can be appointment id, email, phone or appointment index)
         identifier = data['appointment_identifier']
         identifier_type = data.get('identifier_type', 'email')  # Default to email
         file_data = data['file_data']
@@ -1233,15 +1529,14 @@ def upload_medical_history():
             
         # Find the appointment
         target_appointment = None
-        appointment_index = -1
             
-        for i, appointment in enumerate(bot.appointments):
-            if (identifier_type == 'email' and appointment.get('email') == identifier) or \
-               (identifier_type == 'phone' and appointment.get('phone') == identifier) or \
-               (identifier_type == 'index' and i == int(identifier)):
-                target_appointment = appointment
-                appointment_index = i
-                break
+        if identifier_type == 'id':
+            target_appointment = bot.get_appointment(identifier)
+        elif identifier_type in ('email', 'phone'):
+            matches = bot.find_appointments(**{identifier_type: identifier})
+            target_appointment = matches[0] if matches else None
+        elif identifier_type == 'index':
+            target_appointment = bot.get_appointment_at(int(identifier))
                 
         if not target_appointment:
             return jsonify({
@@ -1267,9 +1562,7 @@ def upload_medical_history():
             f.write(base64.b64decode(file_content_base64))
             
         # Update the appointment with file reference
-        target_appointment['medical_history_file'] = destination
-        bot.appointments[appointment_index] = target_appointment
-        bot.save_data(bot.appointments, bot.data_file)
+        bot.update_appointment(target_appointment, medical_history_file=destination)
             
         return jsonify({
             'success': True,
@@ -1423,21 +1716,14 @@ def ai_chat():
             session = ai_sessions[session_id]
             agent = session["agent"]
             
-            # Enhance the user message to ensure comprehensive responses
-            enhanced_prompt = f"""
-            User query: {user_message}
-            
-            Please provide a comprehensive and detailed response that includes:
-            1. A thorough analysis of the question or concern
-            2. Detailed medical information and context relevant to the query
-            3. Multiple perspectives or options when applicable
-            4. Evidence-based recommendations
-            5. Clear explanations of medical terminology
-            
-            Remember to be thorough and provide a complete analysis rather than a brief response.
-            """
+            enhanced_prompt = enhance_ai_message(user_message)
             
-            response = agent.predict(input=enhanced_prompt)
+            reusable = ai_answer_reusable(session)
+            response = cached_ai_answer(session, user_message, enhanced_prompt) if reusable else None
+            if response is None:
+                response = agent.predict(input=enhanced_prompt)
+                if reusable:
+                    remember_ai_answer(session, user_message, response)
             
             return jsonify({
                 "session_id": session_id,
@@ -1452,6 +1738,60 @@ def ai_chat():
         logger.error(f"Unexpected error in ai_chat: {str(e)}")
         return jsonify({"error": "An unexpected error occurred"}), 500
 
+@app.route('/api/ai/chat/stream', methods=['POST'])
+def ai_chat_stream():
+    """
+    Send a message to an AI doctor and stream the response as Server-Sent Events
+    Each 'message' event carries {"token": ...} as the model produces it; a final
+    'done' event carries the whole response, or an 'error' event the failure
+    """
+    logger.info("POST /api/ai/chat/stream request received")
+    
+    data = request.json
+    if not data or 'message' not in data or 'session_id' not in data:
+        logger.error("Missing required parameters")
+        return jsonify({"error": "Missing required parameters"}), 400
+    
+    session_id = data['session_id']
+    user_message = data['message']
+    
+    if not session_id or session_id not in ai_sessions:
+        logger.error(f"Invalid AI session ID: {session_id}")
+        return jsonify({"error": "Invalid session ID"}), 400
+    
+    session = ai_sessions[session_id]
+    
+    def generate():
+        agent = session["agent"]
+        enhanced_prompt = enhance_ai_message(user_message)
+        reusable = ai_answer_reusable(session)
+        response = cached_ai_answer(session, user_message, enhanced_prompt) if reusable else None
+        if response is not None:
+            yield sse_event({"token": response})
+            yield sse_event({"session_id": session_id, "response": response}, event="done")
+            return
+        # Same prompt the conversation chain would build, streamed from its model
+        prompt = agent.prompt.format(input=enhanced_prompt, **agent.memory.load_memory_variables({}))
+        tokens = []
+        try:
+            for chunk in agent.llm.stream(prompt):
+                if chunk.content:
+                    tokens.append(chunk.content)
+                    yield sse_event({"token": chunk.content})
+        except Exception as e:
+            logger.error(f"Error streaming AI chat message: {str(e)}")
+            yield sse_event({"error": str(e)}, event="error")
+            return
+        response = "".join(tokens)
+        if reusable:
+            remember_ai_answer(session, user_message, response)
+        # The exchange is remembered only once the whole answer has been sent
+        agent.memory.save_context({"input": enhanced_prompt}, {"response": response})
+        yield sse_event({"session_id": session_id, "response": response}, event="done")
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/api/ai/upload_medical_record', methods=['POST'])
 def ai_upload_medical_record():
     """Upload a medical record for an AI consultation session"""
@@ -1476,42 +1816,14 @@ def ai_upload_medical_record():
             return jsonify({"error": "No selected file"}), 400
         
         try:
-            # Ensure upload directory exists
-            os.makedirs(app.config['AI_UPLOAD_FOLDER'], exist_ok=True)
-            
-            # Create a unique filename
-            filename = f"{session_id}_{datetime.now().strftime('%Y%m%d%H%M%S')}_{file.filename}"
-            filepath = os.path.join(app.config['AI_UPLOAD_FOLDER'], filename)
+            filename, filepath = ai_medical_record_path(session_id, file.filename)
             
             # Save the file
             file.save(filepath)
-            logger.info(f"File {filename} saved successfully")
-            
-            # Update session with medical record info
-            ai_sessions[session_id]["medical_records"].append({
-                "filename": filename,
-                "original_name": file.filename,
-                "uploaded_at": datetime.now().isoformat()
-            })
+            analysis_prompt = add_ai_medical_record(session_id, filename, file.filename)
             
             # Generate a comprehensive response for the uploaded file
-            session = ai_sessions[session_id]
-            agent = session["agent"]
-            
-            # Create a more detailed prompt to generate comprehensive analysis
-            analysis_prompt = f"""
-            I've uploaded a medical record called {file.filename}. 
-            
-            Please provide a comprehensive analysis including:
-            1. A detailed review of the information in this document
-            2. Potential implications for my health condition
-            3. How this information relates to my current symptoms or condition
-            4. Any recommendations for additional tests or follow-up steps
-            5. Treatment options that might be relevant based on this information
-            
-            Please be thorough and detailed in your analysis.
-            """
-            
+            agent = ai_sessions[session_id]["agent"]
             response = agent.predict(input=analysis_prompt)
             
             return jsonify({
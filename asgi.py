@@ -0,0 +1,185 @@
+"""
+ASGI entry point for the healthcare backend.
+
+Run with ``uvicorn asgi:application`` (or ``python asgi.py``). The routes
+that wait on the LLM - /api/chat, /api/check-symptoms, /api/ai/chat and
+/api/ai/upload_medical_record - are answered on the event loop with the
+async LLM APIs, so a single process keeps many model calls in flight
+instead of one per thread. Requests on those routes that need no model
+call (menu steps, booking flows, invalid input) and every other route
+are passed unchanged to the Flask app, which runs on a thread pool of
+WSGI_THREADS threads.
+"""
+import os
+import shutil
+
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.datastructures import UploadFile
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import Mount, Route
+
+from app import (app, bot, logger, ai_sessions, get_chat_session, chat_llm_step, assistant_reply,
+                 symptom_assessment_reply, enhance_ai_message, ai_answer_reusable, cached_ai_answer,
+                 remember_ai_answer,
+                 ai_medical_record_path, add_ai_medical_record)
+
+flask_app = WSGIMiddleware(app, workers=int(os.getenv("WSGI_THREADS", "32")))
+
+
+def json_response(request, data, status=200):
+    """The response Flask's jsonify would give, including flask-cors' headers"""
+    headers = None
+    if "origin" in request.headers:
+        headers = {"Access-Control-Allow-Origin": request.headers["origin"], "Vary": "Origin"}
+    return Response(app.json.dumps(data) + "\n", status_code=status, headers=headers,
+                    media_type="application/json")
+
+
+async def json_body(request):
+    """The request's JSON object, or None if Flask would not read it as one"""
+    mimetype = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if not (mimetype == "application/json" or mimetype.startswith("application/") and mimetype.endswith("+json")):
+        return None
+    try:
+        data = app.json.loads(await request.body())
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+class AsyncRoute:
+    """
+    ASGI endpoint that answers a POST with an async handler, falling back to
+    the Flask view whenever the handler returns None.
+
+    The request body is read once up front and replayed to Flask, so the
+    handler may inspect it before deciding.
+    """
+
+    def __init__(self, handler):
+        self.handler = handler
+
+    async def __call__(self, scope, receive, send):
+        if scope["method"] != "POST":
+            return await flask_app(scope, receive, send)
+        request = Request(scope, receive)
+        body = await request.body()
+        response = await self.handler(request)
+        if response is not None:
+            return await response(scope, receive, send)
+
+        replayed = False
+
+        async def replay():
+            nonlocal replayed
+            if replayed:
+                return await receive()
+            replayed = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        await flask_app(scope, replay, send)
+
+
+async def chat(request):
+    """/api/chat, when the message goes to the symptom checker or the AI assistant"""
+    data = await json_body(request)
+    if not data or not isinstance(data.get('message'), str):
+        return None
+    user_message = data['message']
+    step = chat_llm_step(data.get('session_id'), user_message)
+    if step is None:
+        return None
+    session_id = get_chat_session(data.get('session_id'))
+    if step == 'symptoms':
+        assessment = await bot.acheck_symptoms(user_message)
+        return json_response(request, symptom_assessment_reply(session_id, assessment))
+    response = await bot.aprocess_user_input(user_message)
+    return json_response(request, assistant_reply(user_message, session_id, response))
+
+
+async def check_symptoms(request):
+    """/api/check-symptoms"""
+    data = await json_body(request)
+    if not data or 'symptoms' not in data:
+        return None
+    assessment = await bot.acheck_symptoms(data['symptoms'])
+    return json_response(request, {
+        'assessment': assessment,
+        'recommended_specialist': getattr(bot, 'recommended_specialist', 'General Physician')
+    })
+
+
+async def ai_chat(request):
+    """/api/ai/chat, for a valid session"""
+    data = await json_body(request)
+    if not data or 'message' not in data or data.get('session_id') not in ai_sessions:
+        return None
+    logger.info("POST /api/ai/chat request received")
+    session_id = data['session_id']
+    user_message = data['message']
+    try:
+        session = ai_sessions[session_id]
+        enhanced_prompt = enhance_ai_message(user_message)
+        reusable = ai_answer_reusable(session)
+        response = cached_ai_answer(session, user_message, enhanced_prompt) if reusable else None
+        if response is None:
+            response = await session["agent"].apredict(input=enhanced_prompt)
+            if reusable:
+                remember_ai_answer(session, user_message, response)
+        return json_response(request, {
+            "session_id": session_id,
+            "response": response
+        })
+    except Exception as e:
+        logger.error(f"Error processing AI chat message: {str(e)}")
+        return json_response(request, {"error": str(e)}, 500)
+
+
+async def ai_upload_medical_record(request):
+    """/api/ai/upload_medical_record, for a valid session and file"""
+    if not request.headers.get("content-type", "").startswith("multipart/form-data"):
+        return None
+    try:
+        form = await request.form()
+    except Exception:
+        return None
+    session_id = form.get('session_id')
+    upload = form.get('file')
+    if session_id not in ai_sessions or not isinstance(upload, UploadFile) or not upload.filename:
+        return None
+    logger.info("POST /api/ai/upload_medical_record request received")
+    try:
+        filename, filepath = ai_medical_record_path(session_id, upload.filename)
+        with open(filepath, 'wb') as file:
+            shutil.copyfileobj(upload.file, file)
+        analysis_prompt = add_ai_medical_record(session_id, filename, upload.filename)
+        response = await ai_sessions[session_id]["agent"].apredict(input=analysis_prompt)
+        return json_response(request, {
+            "session_id": session_id,
+            "filename": filename,
+            "message": "Medical record uploaded successfully",
+            "response": response
+        })
+    except Exception as e:
+        logger.error(f"Error processing AI upload: {str(e)}")
+        return json_response(request, {"error": str(e)}, 500)
+    finally:
+        await form.close()
+
+
+application = Starlette(routes=[
+    Route('/api/chat', AsyncRoute(chat)),
+    Route('/api/check-symptoms', AsyncRoute(check_symptoms)),
+    Route('/api/ai/chat', AsyncRoute(ai_chat)),
+    Route('/api/ai/upload_medical_record', AsyncRoute(ai_upload_medical_record)),
+    Mount('/', app=flask_app)
+])
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    logger.info("Starting Healthcare App ASGI server with AI Doctor integration")
+    uvicorn.run(application, host='0.0.0.0', port=int(os.environ.get('PORT', 5000)))
@@ -0,0 +1,254 @@
+"""
+Benchmarks for the healthcare backend.
+
+Run a single benchmark with ``python benchmarks.py <name> [size]``, or
+``python benchmarks.py`` to list them.
+"""
+import os
+import sys
+import json
+import time
+import random
+import tempfile
+import threading
+import tracemalloc
+from datetime import datetime, timedelta
+
+from records import AppointmentRecord
+from storage import AppointmentJournal, doctor_resolver
+from slots import SlotInventory
+
+
+def make_appointments(count, seed=42):
+    """Generate appointments shaped like the ones in appointments.json"""
+    rng = random.Random(seed)
+    doctors = ["Dr. Smith (General Physician)", "Dr. Johnson (Cardiologist)",
+               "Dr. Williams (Dermatologist)", "Dr. Brown (Orthopedic)",
+               "Dr. Jones (Pediatrician)", "Dr. Davis (Neurologist)",
+               "Dr. Miller (Psychiatrist)", "Dr. Wilson (ENT Specialist)"]
+    times = ["09:00", "10:00", "11:00", "14:00", "15:00", "16:00"]
+    start = datetime(2025, 1, 1)
+    appointments = []
+    for i in range(count):
+        appointments.append({
+            "id": f"{rng.getrandbits(128):032x}",
+            "name": f"Patient {i}",
+            "email": f"patient{i}@example.com",
+            "phone": f"{rng.randrange(10 ** 9, 10 ** 10)}",
+            "age": str(rng.randint(1, 90)),
+            "gender": rng.choice(["male", "female", "other"]),
+            "reason": "Routine checkup",
+            "doctor": rng.choice(doctors),
+            "appointment_date": (start + timedelta(days=rng.randrange(365))).strftime("%Y-%m-%d"),
+            "appointment_time": rng.choice(times),
+        })
+    return appointments
+
+
+def _measure(build):
+    tracemalloc.start()
+    result = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size
+
+
+def bench_memory(size=200000):
+    """Resident size of appointments held as dicts vs AppointmentRecord"""
+    # Round-trip through JSON so strings are not shared, as after json.load
+    payload = json.dumps(make_appointments(size))
+
+    dicts, dict_bytes = _measure(lambda: json.loads(payload))
+    del dicts
+    records, record_bytes = _measure(
+        lambda: [AppointmentRecord.from_dict(data) for data in json.loads(payload)]
+    )
+    del records
+
+    print(f"appointments:        {size}")
+    print(f"dict records:        {dict_bytes / size:8.1f} bytes/appointment")
+    print(f"AppointmentRecord:   {record_bytes / size:8.1f} bytes/appointment")
+    print(f"reduction:           {100 * (1 - record_bytes / dict_bytes):8.1f}%")
+
+
+def bench_startup(size=200000):
+    """Time to first request and to full load against appointments.json size"""
+    print(f"{'appointments':>12} {'eager load':>12} {'first request':>14} {'fully loaded':>13}")
+    for count in (size // 100, size // 10, size):
+        with tempfile.TemporaryDirectory() as directory:
+            snapshot_file = os.path.join(directory, "appointments.json")
+            appointments = make_appointments(count)
+            with open(snapshot_file, 'w') as file:
+                json.dump(appointments, file, indent=4)
+            first_id = appointments[0]["id"]
+            del appointments
+
+            started = time.perf_counter()
+            AppointmentJournal(snapshot_file).load()
+            eager = time.perf_counter() - started
+
+            started = time.perf_counter()
+            store = AppointmentJournal(snapshot_file)
+            store.load(background=True)
+            store.get(first_id)
+            first_request = time.perf_counter() - started
+            store.ready.wait()
+            loaded = time.perf_counter() - started
+
+        print(f"{count:>12} {eager * 1000:>10.1f}ms {first_request * 1000:>12.1f}ms {loaded * 1000:>11.1f}ms")
+
+
+def load_doctors(filename="doctor.json"):
+    with open(filename, 'r') as file:
+        return json.load(file)["doctors"]
+
+
+def bench_reserve(threads=32, days=90):
+    """Concurrent slot reservations; fails if any slot is booked twice"""
+    inventory = SlotInventory(load_doctors(), horizon=days)
+    slots = [(doctor_id, date, time) for doctor_id in inventory.weekly
+             for date in inventory.dates for time in inventory.free_times(doctor_id, date)]
+    booked = [[] for _ in range(threads)]
+    barrier = threading.Barrier(threads)
+
+    def worker(number):
+        # Every thread tries every slot, in its own order
+        order = slots[:]
+        random.Random(number).shuffle(order)
+        barrier.wait()
+        for slot in order:
+            if inventory.reserve(*slot):
+                booked[number].append(slot)
+
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+        started = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - started
+    finally:
+        sys.setswitchinterval(switch_interval)
+
+    all_booked = [slot for slots_booked in booked for slot in slots_booked]
+    attempts = threads * len(slots)
+    print(f"slots:               {len(slots)}")
+    print(f"threads:             {threads}")
+    print(f"reservations:        {attempts} in {elapsed:.2f}s ({attempts / elapsed:,.0f}/s)")
+    print(f"slots booked:        {len(all_booked)} ({len(set(all_booked))} distinct)")
+    if len(all_booked) != len(set(all_booked)) or set(all_booked) != set(slots):
+        print("FAILED: a slot was booked twice or not at all")
+        sys.exit(1)
+    print("ok: every slot booked exactly once")
+
+
+def bench_bookings(size=1000000):
+    """Startup pass marking booked slots from stored appointments"""
+    doctors = load_doctors()
+    # make_appointments books dates in 2025; open the whole year
+    inventory = SlotInventory(doctors, horizon=365, today=datetime(2024, 12, 31).date())
+    free_before = sum(inventory.count_free(doctor_id) for doctor_id in inventory.weekly)
+    records = [AppointmentRecord.from_dict(data) for data in make_appointments(size)]
+
+    started = time.perf_counter()
+    doctor_days = inventory.load_bookings(records, doctor_resolver(doctors))
+    elapsed = time.perf_counter() - started
+
+    free_after = sum(inventory.count_free(doctor_id) for doctor_id in inventory.weekly)
+    print(f"appointments:        {size}")
+    print(f"doctor-days touched: {doctor_days}")
+    print(f"slots booked:        {free_before - free_after} of {free_before}")
+    print(f"load_bookings:       {elapsed * 1000:.1f}ms ({elapsed / size * 1e9:.0f}ns/appointment)")
+
+
+def bench_earliest(doctors=200, horizon=90):
+    """Latency of the soonest-free-slot search with most slots already booked"""
+    weekly = load_doctors()[0]["availability"]
+    inventory = SlotInventory([{"id": str(i), "availability": weekly} for i in range(doctors)], horizon=horizon)
+    rng = random.Random(7)
+    for doctor_id in inventory.weekly:
+        for date in inventory.dates:
+            for slot_time in inventory.free_times(doctor_id, date):
+                if rng.random() < 0.95:
+                    inventory.reserve(doctor_id, date, slot_time)
+
+    doctor_ids = list(inventory.weekly)
+    for label, candidates in (("one doctor", doctor_ids[:1]), ("10 doctors", doctor_ids[:10]),
+                              (f"{doctors} doctors", doctor_ids)):
+        runs = 1000
+        started = time.perf_counter()
+        for _ in range(runs):
+            slots = inventory.earliest(candidates, limit=5)
+        elapsed = (time.perf_counter() - started) / runs
+        print(f"{label:>12}: {elapsed * 1e6:8.1f}us for {len(slots)} slots, first {slots[0][:2] if slots else None}")
+
+
+def bench_ttft(tokens=300, first_token_ms=400, token_ms=10):
+    """Time to first byte of /api/ai/chat vs /api/ai/chat/stream, on a fake streaming model"""
+    # Importing app starts the whole backend, so only this benchmark does it
+    from langchain_core.language_models.fake_chat_models import FakeListChatModel
+    from langchain_core.messages import AIMessageChunk
+    from langchain_core.outputs import ChatGenerationChunk
+    import app
+
+    class FakeStreamingModel(FakeListChatModel):
+        """Answers after first_token seconds, then one word every per_token seconds"""
+        first_token: float = 0.0
+        per_token: float = 0.0
+
+        def _call(self, messages, stop=None, run_manager=None, **kwargs):
+            return "".join(chunk.message.content for chunk in self._stream(messages))
+
+        def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+            time.sleep(self.first_token)
+            for i, word in enumerate(self.responses[0].split(" ")):
+                if i:
+                    time.sleep(self.per_token)
+                yield ChatGenerationChunk(message=AIMessageChunk(content=("" if i == 0 else " ") + word))
+
+    answer = " ".join(f"word{i}" for i in range(tokens))
+    model = FakeStreamingModel(responses=[answer], first_token=first_token_ms / 1000,
+                               per_token=token_ms / 1000)
+    client = app.app.test_client()
+    for path in ("/api/ai/chat", "/api/ai/chat/stream"):
+        session_id = f"bench-{path}"
+        app.ai_sessions[session_id] = {
+            "specialist_type": "diabetes",
+            "agent": app.create_specialist_agent("diabetes", llm=model),
+            "medical_records": [],
+        }
+        # Digits keep the message out of the answer cache
+        message = f"Benchmark question {time.time()}"
+        started = time.perf_counter()
+        response = client.post(path, json={"session_id": session_id, "message": message}, buffered=False)
+        first = None
+        for chunk in response.response:
+            if first is None and chunk:
+                first = time.perf_counter() - started
+        total = time.perf_counter() - started
+        history = app.ai_sessions[session_id]["agent"].memory.chat_memory.messages
+        print(f"{path:>20}: first byte {first * 1000:7.1f}ms, complete {total * 1000:7.1f}ms, "
+              f"{len(history)} messages in memory")
+
+
+BENCHMARKS = {
+    "memory": bench_memory,
+    "startup": bench_startup,
+    "reserve": bench_reserve,
+    "bookings": bench_bookings,
+    "earliest": bench_earliest,
+    "ttft": bench_ttft,
+}
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in BENCHMARKS:
+        print("Usage: python benchmarks.py <benchmark> [size]")
+        for name, func in BENCHMARKS.items():
+            print(f"  {name:12} {func.__doc__}")
+        sys.exit(1)
+    args = [int(arg) for arg in sys.argv[2:]]
+    BENCHMARKS[sys.argv[1]](*args)
@@ -0,0 +1,270 @@
+import os
+import re
+import json
+import math
+import time
+import hashlib
+import itertools
+import threading
+from collections import Counter, OrderedDict
+
+from storage import SnapshotWriter
+
+
+class ResponseCache:
+    """
+    Bounded cache of LLM responses with least-recently-used eviction and a TTL.
+
+    Keys are strings and values must be JSON-serializable. Entries expire
+    ttl seconds after they were stored; once maxsize entries are held, the
+    least recently used one is evicted to make room. Hits, misses, evictions
+    and expirations are counted for stats().
+
+    With a filename the cache is loaded from that file at startup and saved
+    back (atomically, with concurrent saves batched) whenever an entry is
+    added, so a restart does not begin cold. Expiry uses wall-clock time so
+    that it carries across restarts.
+    """
+
+    def __init__(self, maxsize=1024, ttl=3600, filename=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.filename = filename
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.writer = SnapshotWriter(filename) if filename else None
+        if filename:
+            self.load()
+
+    def load(self):
+        """Read unexpired entries back from the cache file, if there is one"""
+        if not os.path.exists(self.filename):
+            return
+        try:
+            with open(self.filename, 'r') as file:
+                saved = json.load(file)
+        except (OSError, ValueError):
+            return
+        now = time.time()
+        with self.lock:
+            for key, expires, value in saved[-self.maxsize:]:
+                if expires > now:
+                    self.entries[key] = (expires, value)
+
+    def get(self, key):
+        """The cached value for key, or None on a miss"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] <= time.time():
+                del self.entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        """Store value under key, evicting the least recently used entry if full"""
+        with self.lock:
+            self.entries[key] = (time.time() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+            saved = [[key, expires, value] for key, (expires, value) in self.entries.items()]
+        if self.writer:
+            self.writer.save(saved)
+
+    def clear(self):
+        """Drop every entry; the counters are kept"""
+        with self.lock:
+            self.entries.clear()
+        if self.writer:
+            self.writer.save([])
+
+    def stats(self):
+        """Size and hit/miss counters, for monitoring"""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self.entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "persistent": self.filename is not None
+            }
+
+
+class SemanticCache:
+    """
+    Reuse of LLM answers for questions that are worded differently.
+
+    Questions are embedded locally as hashed character-trigram vectors, so
+    "what are the symptoms of diabetes?" and "What are symptoms of diabetes"
+    land close together without calling any embedding service. Each vector
+    also gets a random-hyperplane signature, split into bands; a lookup only
+    compares against entries sharing at least one band, and an answer is
+    reused when the cosine similarity reaches the threshold and both
+    questions have the same content words.
+
+    The content-word check is what keeps "should I take aspirin" from
+    answering "should I not take aspirin", or "stage one" from answering
+    "stage four": such pairs are close as trigram vectors but differ in a
+    single word. Filler words, case, punctuation and word order may differ;
+    negations and number words are always content words.
+
+    Entries live in separate namespaces (one per specialist), each holding at
+    most maxsize entries with least-recently-used eviction and a TTL.
+
+    Questions too short to stand on their own, or containing digits or an
+    "@", are never cached: doses, dates, phone numbers and email addresses
+    change the answer while barely changing the vector.
+
+    stands_alone() tells callers whose history is shared or long-lived which
+    questions can be answered without it: those that refer to nothing said
+    earlier and are not about the asker.
+    """
+
+    BANDS = 8
+    BAND_BITS = 6
+    MIN_WORDS = 4
+    FILLER_WORDS = frozenset((
+        "a", "an", "the", "is", "are", "am", "was", "were", "be", "been", "do", "does", "did",
+        "i", "me", "my", "you", "your", "it", "its", "this", "that", "these", "those",
+        "what", "which", "who", "how", "please", "can", "could", "would", "should", "will",
+        "of", "to", "for", "in", "on", "at", "with", "about", "and", "or", "there", "any", "some"
+    ))
+    FOLLOW_UP_WORDS = frozenset((
+        "it", "its", "this", "that", "these", "those", "they", "them", "their", "he", "him", "his",
+        "she", "her", "i", "me", "my", "mine", "we", "us", "our", "above", "earlier", "previous",
+        "again", "also", "too", "else", "same", "other", "another", "then", "yes", "no", "ok", "okay"
+    ))
+
+    def __init__(self, threshold=0.93, maxsize=256, ttl=86400):
+        self.threshold = threshold
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.namespaces = {}
+        self.ids = itertools.count()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.skipped = 0
+        self.evictions = 0
+
+    def cacheable(self, question):
+        """Whether a question may be answered from, or stored in, the cache"""
+        return (len(question.split()) >= self.MIN_WORDS
+                and not re.search(r"[0-9@]", question))
+
+    def stands_alone(self, question):
+        """Whether a question means the same whatever was said before it"""
+        words = re.findall(r"[a-z]+", question.lower())
+        if re.match(r"(and|but|or|so|what about|how about)\b", " ".join(words)):
+            return False
+        return self.cacheable(question) and not self.FOLLOW_UP_WORDS.intersection(words)
+
+    def content_words(self, question):
+        """The words of a question that must match for an answer to be reused"""
+        text = re.sub(r"n't\b", " not", question.lower()).replace("cannot", "can not")
+        return frozenset(re.findall(r"[a-z]+", text)) - self.FILLER_WORDS
+
+    def embed(self, question):
+        """Unit-length sparse vector of a question's character trigrams, keyed by 64-bit hashes"""
+        text = " " + " ".join(re.findall(r"[a-z]+", question.lower())) + " "
+        counts = Counter(text[i:i + 3] for i in range(len(text) - 2))
+        vector = {int.from_bytes(hashlib.blake2b(gram.encode(), digest_size=8).digest(), "big"): count
+                  for gram, count in counts.items()}
+        norm = math.sqrt(sum(weight * weight for weight in vector.values())) or 1.0
+        return {feature: weight / norm for feature, weight in vector.items()}
+
+    def signature(self, vector):
+        """Band keys of the vector's random-hyperplane signature"""
+        # Bit j of a feature's hash says which side of hyperplane j it lies on
+        sums = [0.0] * (self.BANDS * self.BAND_BITS)
+        for feature, weight in vector.items():
+            for bit in range(len(sums)):
+                sums[bit] += weight if feature >> bit & 1 else -weight
+        keys = []
+        for band in range(self.BANDS):
+            value = 0
+            for bit in range(band * self.BAND_BITS, (band + 1) * self.BAND_BITS):
+                value = value << 1 | (sums[bit] > 0)
+            keys.append((band, value))
+        return keys
+
+    def get(self, namespace, question):
+        """A cached answer to a near-identical question, or None"""
+        if not self.cacheable(question):
+            with self.lock:
+                self.skipped += 1
+            return None
+        vector = self.embed(question)
+        keys = self.signature(vector)
+        words = self.content_words(question)
+        now = time.time()
+        with self.lock:
+            entries, buckets = self.namespaces.get(namespace, ({}, {}))
+            best, best_score = None, self.threshold
+            for entry_id in set().union(*(buckets.get(key, ()) for key in keys)):
+                other, _, other_words, answer, expires = entries[entry_id]
+                if expires <= now or other_words != words:
+                    continue
+                score = sum(weight * other.get(feature, 0.0) for feature, weight in vector.items())
+                if score >= best_score:
+                    best, best_score = entry_id, score
+            if best is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            entries[best] = entries.pop(best)
+            return entries[best][3]
+
+    def put(self, namespace, question, answer):
+        """Remember the answer to a question"""
+        if not self.cacheable(question):
+            return
+        vector = self.embed(question)
+        keys = self.signature(vector)
+        with self.lock:
+            entries, buckets = self.namespaces.setdefault(namespace, ({}, {}))
+            entry_id = next(self.ids)
+            entries[entry_id] = (vector, keys, self.content_words(question), answer, time.time() + self.ttl)
+            for key in keys:
+                buckets.setdefault(key, set()).add(entry_id)
+            # Dicts keep insertion order and hits re-insert, so the first entry is the least recent
+            while len(entries) > self.maxsize:
+                oldest = next(iter(entries))
+                for key in entries.pop(oldest)[1]:
+                    buckets[key].discard(oldest)
+                    if not buckets[key]:
+                        del buckets[key]
+                self.evictions += 1
+
+    def stats(self):
+        """Size and hit/miss counters, for monitoring"""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": sum(len(entries) for entries, _ in self.namespaces.values()),
+                "namespaces": len(self.namespaces),
+                "maxsize": self.maxsize,
+                "threshold": self.threshold,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "skipped": self.skipped,
+                "evictions": self.evictions
+            }
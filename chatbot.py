@@ -5,6 +5,7 @@ import re
 import datetime
 from datetime import datetime, timedelta
 import random
+from collections import Counter
 import colorama
 from colorama import Fore, Style
 from langchain_google_genai import ChatGoogleGenerativeAI
@@ -12,9 +13,15 @@ from langchain.prompts import PromptTemplate
 from langchain.memory import ConversationBufferMemory
 from langchain.tools import Tool
 from langchain.agents import AgentExecutor, create_react_agent
+from langchain.callbacks.base import BaseCallbackHandler
 from langchain_community.tools.tavily_search import TavilySearchResults
 from dotenv import load_dotenv
 import threading
+from storage import SnapshotWriter, doctor_resolver, open_appointment_store
+from slots import SlotInventory
+from doctor_registry import DoctorRegistry
+from cache import ResponseCache, SemanticCache
+from llm_pool import LLMPool
 
 # Add rich text formatting libraries
 from rich.console import Console
@@ -33,19 +40,84 @@ console = Console()
 # Load environment variables
 load_dotenv()
 
+# Words that do not change a symptom description, ignored when caching assessments
+SYMPTOM_FILLER_WORDS = frozenset((
+    "a", "an", "the", "i", "im", "am", "is", "been", "have", "has", "had", "having",
+    "got", "my", "me", "some", "also", "of", "feel", "feeling"
+))
+
+# Patterns for validating contact details, also used to find them in free text
+EMAIL_PATTERN = re.compile(r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}')
+PHONE_PATTERN = re.compile(r'\d{10}')
+# A phone number as people type it: "5551234567", "555-123-4567", "(555) 123 4567", "+1 555 123 4567"
+PHONE_TEXT_PATTERN = re.compile(r'(?<![\d+])(?:\+?1[\s.-]?)?\(?\d{3}\)?[\s.-]?\d{3}[\s.-]?\d{4}(?!\d)')
+# "doctor 3", "Dr. 3", "doctor id: 3", "id #3"
+DOCTOR_ID_PATTERN = re.compile(r'\b(?:doctor|dr|id)\b\.?\s*(?:id\b\.?)?\s*(?:#|no\.?|number)?\s*:?\s*([A-Za-z0-9_-]+)', re.IGNORECASE)
+
+# Agent tools whose results don't depend on who is asking or on live data;
+# answers that used only these can be reused for similar questions
+CACHEABLE_TOOLS = frozenset(("SearchHealthInfo", "GetContactInfo"))
+
+
+class ToolUseRecorder(BaseCallbackHandler):
+    """Collects the names of the tools an agent run calls"""
+
+    def __init__(self):
+        self.names = set()
+
+    def on_tool_start(self, serialized, input_str, **kwargs):
+        self.names.add((serialized or {}).get("name"))
+
 class HealthcareBot:
     def __init__(self):
         self.data_file = "appointments.json"
         self.medical_history_file = "medical_history.json"
         self.medications_file = "medications.json"
         self.doctors_file = "doctor.json"
-        self.appointments = self.load_data(self.data_file)
-        self.medical_history = self.load_data(self.medical_history_file)
-        self.medications = self.load_data(self.medications_file)
-        self.doctors_data = self.load_data(self.doctors_file)
+        self.doctor_registry = DoctorRegistry(self.doctors_file)
+        self.doctor_lookup = doctor_resolver(self.doctor_registry.all())
+        self.appointment_store = open_appointment_store(self.data_file, self.resolve_doctor)
+        # Patient data loads in the background so requests can be served right away;
+        # anything that needs the full data waits for its load to finish
+        self.appointment_store.load(background=True)
+        self.medical_history = []
+        self.medications = []
+        self.patient_data_loaded = threading.Event()
+        threading.Thread(target=self.load_patient_data, daemon=True).start()
+        self.snapshot_writers = {}
         self.user_data = {}
-        self.available_slots = self.generate_available_slots()
-        self.doctors = self.load_doctors()
+        self.slot_inventory = SlotInventory(
+            self.doctor_registry.all(),
+            horizon=int(os.getenv("BOOKING_HORIZON_DAYS", "7")),
+            hold_ttl=float(os.getenv("SLOT_HOLD_TTL", "120")),
+            day_hold_limit=int(os.getenv("SLOT_HOLDS_PER_DAY", "2"))
+        )
+        self.slot_inventory.start_rollover()
+        # Slots already booked are marked once the appointments have loaded;
+        # reservations wait until then
+        self.slot_inventory.ready.clear()
+        threading.Thread(target=self.load_booked_slots, daemon=True).start()
+        # Edits to doctor.json are picked up without a restart
+        self.doctor_registry.subscribe(self.reload_doctors)
+        self.doctor_registry.watch(float(os.getenv("DOCTOR_RELOAD_INTERVAL", "2")))
+        # Symptom assessments, keyed by normalized symptoms and model settings
+        self.symptom_cache = ResponseCache(
+            maxsize=int(os.getenv("SYMPTOM_CACHE_SIZE", "1024")),
+            ttl=float(os.getenv("SYMPTOM_CACHE_TTL", "3600")),
+            filename=os.getenv("SYMPTOM_CACHE_FILE") or None
+        )
+        # How identifiers were pulled out of queries: by pattern, by LLM or not at all
+        self.extractions = Counter()
+        self.extraction_lock = threading.Lock()
+        # Answers to general questions, reused for questions worded differently
+        self.answer_cache = SemanticCache(
+            threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.93")),
+            maxsize=int(os.getenv("SEMANTIC_CACHE_SIZE", "256")),
+            ttl=float(os.getenv("SEMANTIC_CACHE_TTL", "86400"))
+        )
+        
+        # Chat model clients shared by the bot and the AI doctor sessions
+        self.llm_pool = LLMPool(int(os.getenv("LLM_MAX_CONCURRENCY", "64")))
         
         # Initialize AI components
         google_api_key = os.getenv("GOOGLE_API_KEY")
@@ -54,7 +126,8 @@ class HealthcareBot:
                 print(Fore.YELLOW + "Warning: No valid Google API key found. Some AI features will be limited." + Style.RESET_ALL)
                 self.llm = None
             else:
-                self.llm = ChatGoogleGenerativeAI(
+                self.llm = self.llm_pool.get(
+                    ChatGoogleGenerativeAI,
                     model="gemini-2.0-flash",
                     google_api_key=google_api_key,
                     temperature=0.7
@@ -143,8 +216,10 @@ class HealthcareBot:
             )
         ]
         
-        # Create the agent
+        # Create the agent, and one without the conversation history for
+        # questions that stand on their own
         self.agent = self.create_agent()
+        self.standalone_agent = self.create_agent(with_memory=False)
         
         # Start reminder checker thread
         self.reminder_thread = threading.Thread(target=self.check_reminders, daemon=True)
@@ -156,23 +231,134 @@ class HealthcareBot:
                 with open(filename, 'r') as file:
                     return json.load(file)
             except json.JSONDecodeError:
-                return [] if filename != self.doctors_file else {"doctors": []}
+                return []
         else:
-            return [] if filename != self.doctors_file else {"doctors": []}
+            return []
+
+    def load_patient_data(self):
+        """Load medical history and medications (runs on a background thread)"""
+        try:
+            self.medical_history[:] = self.load_data(self.medical_history_file)
+            self.medications[:] = self.load_data(self.medications_file)
+        finally:
+            self.patient_data_loaded.set()
 
-    def load_doctors(self):
-        """Load doctors from doctor.json file"""
-        doctors_dict = {}
-        if "doctors" in self.doctors_data:
-            for doctor in self.doctors_data["doctors"]:
-                doctors_dict[doctor["id"]] = f"{doctor['name']} ({doctor['specialty']})"
-        return doctors_dict
+    def load_booked_slots(self):
+        """Mark the slots of stored appointments as booked (runs on a background thread)"""
+        try:
+            self.slot_inventory.load_bookings(self.appointment_store.all(), self.resolve_doctor)
+        finally:
+            self.slot_inventory.ready.set()
+
+    def reload_doctors(self, snapshot):
+        """Rebuild the doctor lookup and slot inventory for a new doctor list"""
+        self.doctor_lookup = doctor_resolver(snapshot.doctors)
+        self.slot_inventory.ready.wait()
+        appointments = self.appointment_store.all()
+        # Requests already using the old inventory finish on it; new ones get the new one
+        self.slot_inventory = self.slot_inventory.reload(snapshot.doctors, appointments, self.resolve_doctor)
+
+    def resolve_doctor(self, record):
+        """Doctor id of an appointment, using the current doctor list"""
+        return self.doctor_lookup(record)
+
+    @property
+    def doctors(self):
+        """Doctor ids mapped to "Name (Specialty)", read through the doctor registry"""
+        return self.doctor_registry.display_names()
 
     def save_data(self, data, filename):
-        with open(filename, 'w') as file:
-            json.dump(data, file, indent=4)
+        # Concurrent saves of the same file are batched into one atomic write
+        writer = self.snapshot_writers.get(filename)
+        if writer is None:
+            writer = self.snapshot_writers.setdefault(filename, SnapshotWriter(filename))
+        writer.save(data)
+
+    def add_appointment(self, appointment):
+        """Store a new appointment and return the stored record"""
+        return self.appointment_store.add(appointment)
+
+    def book_appointment_slot(self, appointment, owner=None):
+        """
+        Reserve the appointment's slot and store it.
+
+        When owner is given, a slot it holds is used and its other holds are
+        released. Returns the stored record, or None if the slot is not free.
+        """
+        doctor_id = self.resolve_doctor(appointment)
+        date = appointment.get("appointment_date")
+        time = appointment.get("appointment_time")
+        if doctor_id is None:
+            return None
+        claimed = owner is not None and self.slot_inventory.claim(owner, doctor_id, date, time)
+        if not claimed and not self.slot_inventory.reserve(doctor_id, date, time):
+            return None
+        try:
+            return self.add_appointment(appointment)
+        except Exception:
+            self.slot_inventory.release(doctor_id, date, time)
+            raise
+
+    def doctors_with_specialty(self, specialty):
+        """Ids of the doctors with a specialty (case-insensitive)"""
+        return [str(doctor["id"]) for doctor in self.doctor_registry.with_specialty(specialty)]
+
+    def find_earliest_slots(self, specialty=None, doctor_ids=None, limit=5, date_from=None):
+        """Next free slots with the given doctors and/or specialty, soonest first"""
+        candidates = self.doctors_with_specialty(specialty) if specialty else list(self.doctors)
+        if doctor_ids is not None:
+            doctor_ids = {str(doctor_id) for doctor_id in doctor_ids}
+            candidates = [doctor_id for doctor_id in candidates if doctor_id in doctor_ids]
+        return [
+            {
+                "doctor_id": doctor_id,
+                "doctor": self.doctors.get(doctor_id),
+                "appointment_date": date,
+                "appointment_time": time
+            }
+            for date, time, doctor_id in self.slot_inventory.earliest(candidates, limit, date_from)
+        ]
+
+    def remove_appointment(self, appointment):
+        """Delete a stored appointment and free its slot"""
+        self.appointment_store.remove(appointment)
+        doctor_id = self.resolve_doctor(appointment)
+        if doctor_id is not None:
+            self.slot_inventory.release(doctor_id, appointment.get("appointment_date"),
+                                        appointment.get("appointment_time"))
+
+    def update_appointment(self, appointment, **changes):
+        """Update fields of a stored appointment"""
+        self.appointment_store.update(appointment, changes)
+
+    def get_appointment(self, appointment_id):
+        """Get an appointment by its id"""
+        return self.appointment_store.get(appointment_id)
+
+    def get_appointment_at(self, index):
+        """Get an appointment by its position in booking order"""
+        return self.appointment_store.at(index)
+
+    def find_appointments(self, email=None, phone=None):
+        """Find appointments by email or phone number"""
+        if not email and not phone:
+            return []
+        return self.appointment_store.find(email=email, phone=phone)
+
+    def find_doctor_appointments(self, doctor_id):
+        """Find all appointments booked with a doctor"""
+        return self.appointment_store.for_doctor(doctor_id)
+
+    def get_doctor_schedule(self, doctor_id, date_from=None, date_to=None):
+        """Get a doctor's appointments ordered by date and time"""
+        return self.appointment_store.schedule(doctor_id, date_from, date_to)
 
-    def create_agent(self):
+    def get_doctor_schedule_page(self, doctor_id, date_from=None, date_to=None, after=None, limit=50,
+                                 descending=False):
+        """Get one page of a doctor's appointments and the key to continue from"""
+        return self.appointment_store.schedule_page(doctor_id, date_from, date_to, after, limit, descending)
+
+    def create_agent(self, with_memory=True):
         # If LLM is not available, return None
         if self.llm is None:
             return None
@@ -213,19 +399,16 @@ class HealthcareBot:
         agent_executor = AgentExecutor(
             agent=agent,
             tools=self.tools,
-            memory=self.memory,
+            memory=self.memory if with_memory else None,
             verbose=True
         )
         
         return agent_executor
 
-    def generate_available_slots(self):
-        slots = {}
-        # Generate slots for next 7 days
-        for i in range(7):
-            date = (datetime.now() + timedelta(days=i+1)).strftime("%Y-%m-%d")
-            slots[date] = ["09:00", "10:00", "11:00", "14:00", "15:00", "16:00"]
-        return slots
+    @property
+    def available_slots(self):
+        """Times free with any doctor, by date"""
+        return self.slot_inventory.union()
 
     def clear_screen(self):
         os.system('cls' if os.name == 'nt' else 'clear')
@@ -264,12 +447,80 @@ class HealthcareBot:
         return text
 
     def validate_email(self, email):
-        pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-        return re.match(pattern, email) is not None
+        return EMAIL_PATTERN.fullmatch(email) is not None
 
     def validate_phone(self, phone):
-        pattern = r'^\d{10}$'
-        return re.match(pattern, phone) is not None
+        return PHONE_PATTERN.fullmatch(phone) is not None
+
+    def extract_contact(self, query):
+        """
+        The email address or phone number a query refers to.
+
+        Queries holding exactly one are read with the same patterns used to
+        validate input; the LLM is only asked when there is none or several.
+        """
+        emails = EMAIL_PATTERN.findall(query)
+        phones = [re.sub(r"\D", "", phone)[-10:] for phone in PHONE_TEXT_PATTERN.findall(EMAIL_PATTERN.sub(" ", query))]
+        found = list(dict.fromkeys(emails + [phone for phone in phones if self.validate_phone(phone)]))
+        if len(found) == 1:
+            self.count_extraction("contact", "fast_path")
+            return found[0]
+        return self.extract_with_llm("contact", f"""
+        Extract the email address or phone number from the following query:
+        {query}
+        
+        Return ONLY the email or phone number, nothing else.
+        """)
+
+    def extract_doctor_id(self, query):
+        """
+        The id of the doctor a query refers to.
+
+        Ids named after "doctor", "Dr" or "id" are preferred, then doctors'
+        names; the LLM is only asked when that leaves none or several. A bare
+        number is never taken as an id, since in "the 2 latest appointments
+        for Dr. Smith" it is a count, not a doctor.
+        """
+        known = self.doctor_registry.snapshot().by_id
+        words = re.findall(r"[A-Za-z0-9_-]+", query)
+        found = [doctor_id for doctor_id in DOCTOR_ID_PATTERN.findall(query) if doctor_id in known]
+        if not found:
+            lowered = {word.lower() for word in words} - {"dr", "doctor"}
+            found = [doctor_id for doctor_id, doctor in known.items()
+                     if lowered & set(re.findall(r"[a-z0-9_-]+", doctor["name"].lower()))]
+        found = list(dict.fromkeys(found))
+        if len(found) == 1:
+            self.count_extraction("doctor_id", "fast_path")
+            return found[0]
+        return self.extract_with_llm("doctor_id", f"""
+        Extract the doctor ID from the following query:
+        {query}
+        
+        Return ONLY the doctor ID, nothing else.
+        """)
+
+    def extract_with_llm(self, kind, prompt):
+        """Ask the LLM for an identifier the fast path couldn't settle"""
+        if self.llm is None:
+            self.count_extraction(kind, "unresolved")
+            return ""
+        self.count_extraction(kind, "llm")
+        return self.llm.invoke(prompt).content.strip()
+
+    def count_extraction(self, kind, path):
+        with self.extraction_lock:
+            self.extractions[kind, path] += 1
+
+    def extraction_stats(self):
+        """How often identifiers were extracted without the LLM, per kind, for monitoring"""
+        with self.extraction_lock:
+            stats = {}
+            for kind in ("contact", "doctor_id"):
+                counts = {path: self.extractions[kind, path] for path in ("fast_path", "llm", "unresolved")}
+                total = sum(counts.values())
+                counts["fast_path_rate"] = counts["fast_path"] / total if total else 0.0
+                stats[kind] = counts
+            return stats
 
     def get_input(self, prompt, validation_func=None, error_message=None, color=Fore.CYAN):
         while True:
@@ -289,13 +540,16 @@ class HealthcareBot:
         while True:
             choice = input(Fore.GREEN + "> " + Style.RESET_ALL).strip()
             if choice in self.doctors:
-                return self.doctors[choice]
+                return choice
             else:
                 self.typing_effect("Invalid choice. Please select a valid option.", Fore.RED)
 
-    def select_date_time(self):
+    def select_date_time(self, doctor_id):
+        dates = self.slot_inventory.free_dates(doctor_id)
+        if not dates:
+            self.typing_effect("\nSorry, this doctor has no free slots in the coming days. Please choose another doctor.", Fore.RED)
+            return None, None
         self.typing_effect("\nAvailable dates for appointment:", Fore.CYAN)
-        dates = list(self.available_slots.keys())
         for i, date in enumerate(dates, 1):
             self.typing_effect(f"{i}. {date}", Fore.YELLOW)
         
@@ -313,18 +567,21 @@ class HealthcareBot:
                 self.typing_effect("Please enter a valid number.", Fore.RED)
         
         selected_date = dates[date_index]
+        times = self.slot_inventory.free_times(doctor_id, selected_date)
         self.typing_effect(f"\nAvailable time slots for {selected_date}:", Fore.CYAN)
-        for i, time_slot in enumerate(self.available_slots[selected_date], 1):
+        for i, time_slot in enumerate(times, 1):
             self.typing_effect(f"{i}. {time_slot}", Fore.YELLOW)
         
         while True:
             try:
                 self.typing_effect("Please select a time slot (enter the number):", Fore.CYAN)
                 time_index = int(input(Fore.GREEN + "> " + Style.RESET_ALL).strip()) - 1
-                if 0 <= time_index < len(self.available_slots[selected_date]):
-                    selected_time = self.available_slots[selected_date][time_index]
-                    # Remove the selected slot from available slots
-                    self.available_slots[selected_date].remove(selected_time)
+                if 0 <= time_index < len(times):
+                    selected_time = times[time_index]
+                    # Mark the slot as booked
+                    if not self.slot_inventory.reserve(doctor_id, selected_date, selected_time):
+                        self.typing_effect("That slot was just booked. Please select another time.", Fore.RED)
+                        continue
                     return selected_date, selected_time
                 else:
                     self.typing_effect("Invalid selection. Please try again.", Fore.RED)
@@ -349,8 +606,12 @@ class HealthcareBot:
         self.user_data["age"] = self.get_input("What is your age?")
         self.user_data["gender"] = self.get_input("What is your gender? (Male/Female/Other)")
         self.user_data["reason"] = self.get_input("Briefly describe the reason for your visit:")
-        self.user_data["doctor"] = self.select_doctor()
-        date, time_slot = self.select_date_time()
+        date = None
+        while not date:
+            doctor_id = self.select_doctor()
+            date, time_slot = self.select_date_time(doctor_id)
+        self.user_data["doctor"] = self.doctors[doctor_id]
+        self.user_data["doctor_id"] = doctor_id
         self.user_data["appointment_date"] = date
         self.user_data["appointment_time"] = time_slot
         
@@ -389,14 +650,8 @@ class HealthcareBot:
         self.set_appointment_reminder(self.user_data)
 
     def check_existing_appointments(self, email=None, phone=None):
-        if not email and not phone:
-            return None
-            
-        for appointment in self.appointments:
-            if (email and appointment.get("email") == email) or \
-               (phone and appointment.get("phone") == phone):
-                return appointment
-        return None
+        found = self.find_appointments(email=email, phone=phone)
+        return found[0] if found else None
 
     def show_existing_appointment(self, appointment):
         self.clear_screen()
@@ -418,8 +673,7 @@ class HealthcareBot:
         
         choice = input(Fore.GREEN + "> " + Style.RESET_ALL).strip()
         if choice == "2":
-            self.appointments.remove(appointment)
-            self.save_data(self.appointments, self.data_file)
+            self.remove_appointment(appointment)
             self.typing_effect("Your appointment has been cancelled successfully.", Fore.GREEN)
             return "cancelled"
         elif choice == "3":
@@ -461,8 +715,7 @@ class HealthcareBot:
                 else:
                     self.typing_effect("\nFile not found. Continuing without uploading medical history.", Fore.RED)
             
-            self.appointments.append(user_data)
-            self.save_data(self.appointments, self.data_file)
+            self.add_appointment(user_data)
             self.display_appointment_summary()
             
             # Ask if user wants to exit after booking
@@ -479,15 +732,8 @@ class HealthcareBot:
 
     def check_appointment(self, query):
         """Check existing appointment details"""
-        # Extract email or phone from the query using AI
-        prompt = f"""
-        Extract the email address or phone number from the following query:
-        {query}
-        
-        Return ONLY the email or phone number, nothing else.
-        """
-        
-        extracted_info = self.llm.invoke(prompt).content.strip()
+        # Extract email or phone from the query
+        extracted_info = self.extract_contact(query)
         
         if "@" in extracted_info:  # It's an email
             appointment = self.check_existing_appointments(email=extracted_info)
@@ -501,15 +747,8 @@ class HealthcareBot:
 
     def cancel_appointment(self, query):
         """Cancel an existing appointment"""
-        # Extract email or phone from the query using AI
-        prompt = f"""
-        Extract the email address or phone number from the following query:
-        {query}
-        
-        Return ONLY the email or phone number, nothing else.
-        """
-        
-        extracted_info = self.llm.invoke(prompt).content.strip()
+        # Extract email or phone from the query
+        extracted_info = self.extract_contact(query)
         
         if "@" in extracted_info:  # It's an email
             appointment = self.check_existing_appointments(email=extracted_info)
@@ -517,8 +756,7 @@ class HealthcareBot:
             appointment = self.check_existing_appointments(phone=extracted_info)
             
         if appointment:
-            self.appointments.remove(appointment)
-            self.save_data(self.appointments, self.data_file)
+            self.remove_appointment(appointment)
             return f"Appointment for {appointment['name']} has been cancelled successfully."
         else:
             return "No appointment found with the provided information."
@@ -533,8 +771,13 @@ class HealthcareBot:
     def get_available_slots(self, query):
         """Get available appointment slots"""
         slots_info = "Available appointment slots:\n"
-        for date, times in self.available_slots.items():
-            slots_info += f"{date}: {', '.join(times)}\n"
+        for doctor_id, doctor in self.doctors.items():
+            slots = self.slot_inventory.free_slots(doctor_id)
+            if not slots:
+                continue
+            slots_info += f"\n{doctor}:\n"
+            for date, times in slots.items():
+                slots_info += f"{date}: {', '.join(times)}\n"
         return slots_info
 
     def search_health_info(self, query):
@@ -573,65 +816,170 @@ class HealthcareBot:
         
     def check_symptoms(self, query):
         """Check symptoms and provide preliminary assessment"""
+        reply, key, prompt = self.start_symptom_check(query)
+        if reply is not None:
+            return reply
+        try:
+            return self.finish_symptom_check(key, self.llm.invoke(prompt).content)
+        except Exception as e:
+            return f"Error checking symptoms: {str(e)}"
+
+    async def acheck_symptoms(self, query):
+        """check_symptoms for asyncio callers; the event loop is free while the LLM answers"""
+        reply, key, prompt = self.start_symptom_check(query)
+        if reply is not None:
+            return reply
+        try:
+            return self.finish_symptom_check(key, (await self.llm.ainvoke(prompt)).content)
+        except Exception as e:
+            return f"Error checking symptoms: {str(e)}"
+
+    def start_symptom_check(self, query):
+        """
+        Everything in a symptom check before the LLM call.
+
+        Returns (reply, key, prompt): a reply when no LLM call is needed (no
+        symptoms, no LLM, or a cached assessment), otherwise the cache key and
+        the prompt to send.
+        """
         if not query:
-            return "Please provide symptoms to check."
+            return "Please provide symptoms to check.", None, None
             
         if self.llm is None:
             self.recommended_specialist = "General Physician"
-            return "AI-powered symptom analysis is not available. Please consult with a General Physician for a proper diagnosis."
+            return "AI-powered symptom analysis is not available. Please consult with a General Physician for a proper diagnosis.", None, None
         
         try:
-            # Use AI to analyze symptoms and provide preliminary assessment
+            key = self.symptom_cache_key(query)
+            assessment = self.symptom_cache.get(key)
+            if assessment is not None:
+                self.recommended_specialist = assessment["specialist"]
+                return self.format_symptom_assessment(assessment), None, None
+
+            # One call returns both the assessment and the specialist, who must
+            # be one of the specialties our doctors actually have
+            specialties = self.doctor_registry.specialties()
             prompt = f"""
             As a healthcare AI assistant, analyze the following symptoms and provide a preliminary assessment:
             
             {query}
             
-            Please provide:
-            1. Possible conditions
-            2. Severity assessment (mild, moderate, severe)
-            3. Recommended next steps
-            4. Whether immediate medical attention is needed
-            5. Recommended specialist type (e.g., Cardiologist, Dermatologist, etc.)
-            
-            Format your response in a clear, structured way.
-            """
-            
-            assessment = self.llm.invoke(prompt).content
-            
-            # Extract recommended specialist from the assessment
-            specialist_prompt = f"""
-            Based on the following assessment, extract ONLY the recommended specialist type:
-            
-            {assessment}
-            
-            Return ONLY the specialist type (e.g., Cardiologist, Dermatologist, etc.) or "General Physician" if no specific specialist is mentioned.
+            Respond with ONLY a JSON object with these keys:
+            - "possible_conditions": list of possible conditions
+            - "severity": one of "mild", "moderate", "severe"
+            - "next_steps": list of recommended next steps
+            - "immediate_attention": true if immediate medical attention is needed, otherwise false
+            - "specialist": the recommended specialist, exactly one of: {", ".join(json.dumps(specialty) for specialty in specialties)}
             """
-            
-            recommended_specialist = self.llm.invoke(specialist_prompt).content.strip()
-            
-            # Store the recommended specialist for later use
-            self.recommended_specialist = recommended_specialist
-            
-            return assessment
+            return None, key, prompt
         except Exception as e:
-            return f"Error checking symptoms: {str(e)}"
+            return f"Error checking symptoms: {str(e)}", None, None
+
+    def finish_symptom_check(self, key, text):
+        """Parse, cache and format the LLM's reply to a symptom check"""
+        assessment = self.parse_symptom_assessment(text)
+        # Replies that had to be read as free text are not worth keeping
+        if assessment["text"] is None:
+            self.symptom_cache.put(key, assessment)
         
-    def get_specialist_doctors(self, specialist_type):
-        """Get doctors of a specific specialty"""
-        matching_doctors = []
+        # Store the recommended specialist for later use
+        self.recommended_specialist = assessment["specialist"]
         
-        # Find matching doctors based on specialty
-        specialist_type_lower = specialist_type.lower()
-        for doctor in self.doctors_data["doctors"]:
-            if specialist_type_lower in doctor["specialty"].lower():
-                matching_doctors.append(f"{doctor['name']} ({doctor['specialty']})")
+        return self.format_symptom_assessment(assessment)
+
+    def symptom_cache_key(self, query):
+        """
+        Cache key for a symptom check.
+
+        The symptoms are split into phrases at commas, semicolons, full
+        stops, line breaks and the words "and", "with" and "plus". Each phrase
+        is lowercased and stripped of punctuation and filler words with its
+        word order kept, and only whole phrases are sorted, so "Headache,
+        fever" and "fever and headache" share an entry while "fever, no
+        cough" and "cough, no fever" do not. The
+        model settings and the specialties on offer are part of the key,
+        since either changes the answer.
+        """
+        phrases = []
+        for phrase in re.split(r"[,;\n]|\.(?:\s|$)|\b(?:and|with|plus)\b", query.lower().replace("'", "")):
+            words = [word for word in re.findall(r"[a-z0-9]+(?:\.[0-9]+)?", phrase) if word not in SYMPTOM_FILLER_WORDS]
+            if words:
+                phrases.append(" ".join(words))
+        return json.dumps([
+            ", ".join(sorted(phrases)),
+            getattr(self.llm, "model", None),
+            getattr(self.llm, "temperature", None),
+            self.doctor_registry.specialties()
+        ])
+
+    def parse_symptom_assessment(self, text):
+        """
+        Read the structured symptom assessment returned by the LLM.
+
+        The JSON object is validated field by field and the specialist is
+        mapped onto a doctor.json specialty. If the reply is not valid JSON,
+        it is kept as free text and the severity and specialist are picked out
+        of its lines instead.
+        """
+        try:
+            data = json.loads(text[text.index("{"):text.rindex("}") + 1])
+            if not isinstance(data, dict):
+                raise ValueError("Assessment is not a JSON object")
+        except ValueError:
+            specialist = re.search(r"specialist[^:\n]*:\s*(.+)", text, re.IGNORECASE)
+            severity = re.search(r"\b(mild|moderate|severe)\b", text, re.IGNORECASE)
+            urgent = re.search(r"immediate[^:\n]*:\s*(yes|no)\b", text, re.IGNORECASE)
+            return {
+                "possible_conditions": [],
+                "severity": severity.group(1).lower() if severity else None,
+                "next_steps": [],
+                "immediate_attention": bool(urgent) and urgent.group(1).lower() == "yes",
+                "specialist": self.doctor_registry.canonical_specialty(specialist.group(1) if specialist else ""),
+                "text": text.strip()
+            }
+
+        def text_list(value):
+            if isinstance(value, str):
+                value = [value]
+            if not isinstance(value, list):
+                return []
+            return [str(item).strip() for item in value if str(item).strip()]
+
+        severity = str(data.get("severity", "")).strip().lower()
+        urgent = data.get("immediate_attention")
+        if isinstance(urgent, str):
+            urgent = urgent.strip().lower() in ("true", "yes")
+        return {
+            "possible_conditions": text_list(data.get("possible_conditions")),
+            "severity": severity if severity in ("mild", "moderate", "severe") else None,
+            "next_steps": text_list(data.get("next_steps")),
+            "immediate_attention": bool(urgent),
+            "specialist": self.doctor_registry.canonical_specialty(str(data.get("specialist") or "")),
+            "text": None
+        }
+
+    def format_symptom_assessment(self, assessment):
+        """Render a parsed symptom assessment as the text shown to the user"""
+        if assessment["text"]:
+            return assessment["text"]
+        lines = ["Possible conditions:"]
+        lines += [f"- {condition}" for condition in assessment["possible_conditions"]] or ["- Unclear from the symptoms given"]
+        if assessment["severity"]:
+            lines.append(f"\nSeverity: {assessment['severity'].capitalize()}")
+        if assessment["next_steps"]:
+            lines.append("\nRecommended next steps:")
+            lines += [f"- {step}" for step in assessment["next_steps"]]
+        if assessment["immediate_attention"]:
+            lines.append("\nImmediate medical attention: Yes - please seek care right away or call 911 in an emergency.")
+        else:
+            lines.append("\nImmediate medical attention: Not indicated")
+        lines.append(f"\nRecommended specialist: {assessment['specialist']}")
+        return "\n".join(lines)
         
-        # If no matches found, return all doctors
-        if not matching_doctors:
-            return list(self.doctors.values())
-            
-        return matching_doctors
+    def get_specialist_doctors(self, specialist_type):
+        """Get doctors of a specific specialty, or general physicians if none match"""
+        return [f"{doctor['name']} ({doctor['specialty']})"
+                for doctor in self.doctor_registry.specialists(specialist_type)]
         
     def add_medical_history(self, query):
         """Add information to patient's medical history"""
@@ -654,6 +1002,7 @@ class HealthcareBot:
             import json
             info = json.loads(extracted_info)
             
+            self.patient_data_loaded.wait()
             # Find or create patient record
             patient_record = None
             for record in self.medical_history:
@@ -685,15 +1034,9 @@ class HealthcareBot:
     def get_medical_history(self, query):
         """Retrieve patient's medical history"""
         # Extract patient identifier
-        prompt = f"""
-        Extract the email address or phone number from the following query:
-        {query}
-        
-        Return ONLY the email or phone number, nothing else.
-        """
-        
-        extracted_info = self.llm.invoke(prompt).content.strip()
+        extracted_info = self.extract_contact(query)
         
+        self.patient_data_loaded.wait()
         # Find patient record
         patient_record = None
         for record in self.medical_history:
@@ -734,6 +1077,7 @@ class HealthcareBot:
             import json
             info = json.loads(extracted_info)
             
+            self.patient_data_loaded.wait()
             # Find or create patient record
             patient_record = None
             for record in self.medications:
@@ -770,15 +1114,9 @@ class HealthcareBot:
     def get_medications(self, query):
         """Retrieve patient's medication list"""
         # Extract patient identifier
-        prompt = f"""
-        Extract the email address or phone number from the following query:
-        {query}
-        
-        Return ONLY the email or phone number, nothing else.
-        """
-        
-        extracted_info = self.llm.invoke(prompt).content.strip()
+        extracted_info = self.extract_contact(query)
         
+        self.patient_data_loaded.wait()
         # Find patient record
         patient_record = None
         for record in self.medications:
@@ -906,30 +1244,17 @@ class HealthcareBot:
     def get_doctor_appointments(self, query):
         """Get appointments for a specific doctor"""
         # Extract doctor ID from the query
-        prompt = f"""
-        Extract the doctor ID from the following query:
-        {query}
-        
-        Return ONLY the doctor ID, nothing else.
-        """
-        
-        doctor_id = self.llm.invoke(prompt).content.strip()
+        doctor_id = self.extract_doctor_id(query)
         
         # Find doctor name
-        doctor_name = None
-        for doctor in self.doctors_data["doctors"]:
-            if doctor["id"] == doctor_id:
-                doctor_name = doctor["name"]
-                break
+        doctor = self.doctor_registry.get(doctor_id)
+        doctor_name = doctor["name"] if doctor else None
                 
         if not doctor_name:
             return f"No doctor found with ID {doctor_id}."
             
         # Find appointments for this doctor
-        doctor_appointments = []
-        for appointment in self.appointments:
-            if doctor_name in appointment.get("doctor", ""):
-                doctor_appointments.append(appointment)
+        doctor_appointments = self.get_doctor_schedule(doctor_id)
                 
         if not doctor_appointments:
             return f"No appointments found for Dr. {doctor_name}."
@@ -947,26 +1272,86 @@ class HealthcareBot:
     def process_user_input(self, user_input):
         """Process user input and generate a response"""
         if self.agent is None:
-            # Fallback to basic responses when AI is not available
-            if "book" in user_input.lower() and "appointment" in user_input.lower():
-                return "To book an appointment, please select option 1 from the main menu."
-            elif "check" in user_input.lower() and "appointment" in user_input.lower():
-                return "To check your appointment, please select option 2 from the main menu."
-            elif "cancel" in user_input.lower() and "appointment" in user_input.lower():
-                return "To cancel an appointment, please select option 3 from the main menu."
-            elif "doctor" in user_input.lower():
-                return self.get_doctor_info("")
-            elif "symptom" in user_input.lower():
-                return "To check symptoms, please select option 5 from the main menu."
-            else:
-                return "I'm operating in limited mode without AI features. Please select an option from the menu or try again later when full functionality is restored."
+            return self.limited_mode_reply(user_input)
         
         try:
-            return self.agent.invoke({"input": user_input})["output"]
+            reusable = self.answer_reusable(user_input)
+            answer = self.cached_answer(user_input) if reusable else None
+            if answer is not None:
+                return answer
+            if not reusable:
+                return self.agent.invoke({"input": user_input})["output"]
+            tools = ToolUseRecorder()
+            answer = self.standalone_agent.invoke({"input": user_input, "chat_history": []},
+                                                  config={"callbacks": [tools]})["output"]
+            self.memory.save_context({"input": user_input}, {"output": answer})
+            self.remember_answer(user_input, answer, tools)
+            return answer
         except Exception as e:
             print(f"Error in agent processing: {str(e)}")
             return "I'm sorry, I encountered an error processing your request. Please try again."
 
+    async def aprocess_user_input(self, user_input):
+        """process_user_input for asyncio callers; the event loop is free while the agent runs"""
+        if self.agent is None:
+            return self.limited_mode_reply(user_input)
+        
+        try:
+            reusable = self.answer_reusable(user_input)
+            answer = self.cached_answer(user_input) if reusable else None
+            if answer is not None:
+                return answer
+            if not reusable:
+                return (await self.agent.ainvoke({"input": user_input}))["output"]
+            tools = ToolUseRecorder()
+            answer = (await self.standalone_agent.ainvoke({"input": user_input, "chat_history": []},
+                                                          config={"callbacks": [tools]}))["output"]
+            self.memory.save_context({"input": user_input}, {"output": answer})
+            self.remember_answer(user_input, answer, tools)
+            return answer
+        except Exception as e:
+            print(f"Error in agent processing: {str(e)}")
+            return "I'm sorry, I encountered an error processing your request. Please try again."
+
+    def limited_mode_reply(self, user_input):
+        """Fallback to basic responses when AI is not available"""
+        if "book" in user_input.lower() and "appointment" in user_input.lower():
+            return "To book an appointment, please select option 1 from the main menu."
+        elif "check" in user_input.lower() and "appointment" in user_input.lower():
+            return "To check your appointment, please select option 2 from the main menu."
+        elif "cancel" in user_input.lower() and "appointment" in user_input.lower():
+            return "To cancel an appointment, please select option 3 from the main menu."
+        elif "doctor" in user_input.lower():
+            return self.get_doctor_info("")
+        elif "symptom" in user_input.lower():
+            return "To check symptoms, please select option 5 from the main menu."
+        else:
+            return "I'm operating in limited mode without AI features. Please select an option from the menu or try again later when full functionality is restored."
+
+    def answer_reusable(self, user_input):
+        """
+        Whether the answer may come from, or go to, the answer cache.
+
+        The conversation memory is shared by every chat and keeps growing, so
+        an answer is only shared if it did not depend on it: a question that
+        stands on its own is answered by the agent without history, and the
+        exchange is then added to the memory. Follow-ups go to the agent with
+        the full history and are never cached.
+        """
+        return self.answer_cache.stands_alone(user_input)
+
+    def cached_answer(self, user_input):
+        """An earlier answer to a near-identical question, added to the conversation; None if there is none"""
+        answer = self.answer_cache.get("assistant", user_input)
+        if answer is not None:
+            self.memory.save_context({"input": user_input}, {"output": answer})
+        return answer
+
+    def remember_answer(self, user_input, answer, tools):
+        """Keep an agent answer for similar questions, unless it depended on the user's own data"""
+        if tools.names <= CACHEABLE_TOOLS:
+            self.answer_cache.put("assistant", user_input, answer)
+
     def start(self):
         self.clear_screen()
         self.rich_panel("👋 Welcome to AI HealthCare Assistant! 👋", 
@@ -1118,8 +1503,7 @@ class HealthcareBot:
                         
                         # Collect user info and book appointment
                         user_data = self.collect_user_info()
-                        self.appointments.append(user_data)
-                        self.save_data(self.appointments, self.data_file)
+                        self.add_appointment(user_data)
                         self.display_appointment_summary()
                         
                         # Ask if user wants to exit after booking
@@ -0,0 +1,209 @@
+import os
+import re
+import json
+import hashlib
+import threading
+
+
+# Where no specialist matches, patients are routed to a general physician
+GENERAL_PHYSICIAN = "General Physician"
+
+# Other ways of naming each specialty in doctor.json, as patients or the LLM put it
+SPECIALTY_SYNONYMS = {
+    "Cardiologist": ("cardiology", "cardiac", "cardiovascular", "heart", "heart specialist",
+                     "heart doctor"),
+    "Dermatologist": ("dermatology", "skin", "skin specialist", "skin doctor"),
+    "ENT Specialist": ("ent", "ear nose throat", "ear nose and throat", "otolaryngologist",
+                       "otolaryngology", "otorhinolaryngologist"),
+    "General Physician": ("gp", "general practitioner", "family doctor", "family physician",
+                          "primary care", "primary care physician", "internist",
+                          "internal medicine"),
+    "Neurologist": ("neurology", "neuro", "brain specialist", "nerve specialist"),
+    "Orthopedic": ("orthopedics", "orthopaedic", "orthopaedics", "orthopedist", "orthopaedist",
+                   "orthopedic surgeon", "bone specialist", "bone doctor"),
+    "Pediatrician": ("pediatrics", "paediatrician", "paediatrics", "child specialist",
+                     "children s doctor"),
+    "Psychiatrist": ("psychiatry", "mental health", "mental health specialist"),
+}
+
+# Longest synonym, in words; free text is scanned for phrases up to this length
+MAX_TERM_WORDS = 4
+
+
+def normalize_term(text):
+    """Lowercase a specialty name and reduce it to words separated by single spaces"""
+    return " ".join(re.findall(r"[a-z0-9]+", text.lower()))
+
+
+class DoctorSnapshot:
+    """One parsed version of doctor.json, indexed by id and specialty; treat as read-only"""
+
+    __slots__ = ("doctors", "by_id", "by_specialty", "specialties", "specialty_index",
+                 "display_names", "digest")
+
+    def __init__(self, doctors, digest=None):
+        self.doctors = doctors
+        self.by_id = {str(doctor["id"]): doctor for doctor in doctors}
+        self.by_specialty = {}
+        for doctor in doctors:
+            self.by_specialty.setdefault(doctor.get("specialty", "").lower(), []).append(doctor)
+        self.specialties = list(dict.fromkeys(doctor.get("specialty", "") for doctor in doctors))
+        # Normalized specialty names and their synonyms, each mapped to doctor ids
+        synonyms = {normalize_term(specialty): terms for specialty, terms in SPECIALTY_SYNONYMS.items()}
+        self.specialty_index = {}
+        for doctor in doctors:
+            specialty = normalize_term(doctor.get("specialty", ""))
+            for term in (specialty, *synonyms.get(specialty, ())):
+                self.specialty_index.setdefault(term, []).append(str(doctor["id"]))
+        self.display_names = {doctor["id"]: f"{doctor['name']} ({doctor['specialty']})" for doctor in doctors}
+        self.digest = digest
+
+    def match_specialty(self, text):
+        """
+        Ids of the doctors a free-text specialty refers to.
+
+        The whole text is looked up first; failing that, every phrase of up
+        to MAX_TERM_WORDS words in it, so "a Cardiologist (heart specialist)"
+        still matches. Returns [] if nothing matches.
+        """
+        term = normalize_term(text)
+        if term in self.specialty_index:
+            return self.specialty_index[term]
+        words = term.split()
+        matched = []
+        for size in range(min(MAX_TERM_WORDS, len(words)), 0, -1):
+            for start in range(len(words) - size + 1):
+                for doctor_id in self.specialty_index.get(" ".join(words[start:start + size]), ()):
+                    if doctor_id not in matched:
+                        matched.append(doctor_id)
+        return matched
+
+
+class DoctorRegistry:
+    """
+    Shared, cached view of doctor.json.
+
+    The file is parsed once into a DoctorSnapshot. Every lookup stats the
+    file, re-reads it only when its mtime or size has changed, and re-indexes
+    only when the content hash differs as well. A new snapshot replaces the
+    old one in a single assignment, so readers never see a half-built index
+    and code holding an older snapshot keeps a consistent view of it.
+
+    watch() polls the file on a background thread, which also hands each new
+    snapshot to the subscribers that rebuild state derived from the doctors.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.lock = threading.Lock()
+        self.stamp = None
+        self.current = DoctorSnapshot([])
+        self.subscribers = []
+        self.changed = threading.Event()
+        self.refresh()
+
+    def refresh(self):
+        """Re-read the file if it changed on disk; returns True if the doctors changed"""
+        stamp = self._stamp()
+        if stamp == self.stamp:
+            return False
+        with self.lock:
+            if stamp == self.stamp:
+                return False
+            data = b""
+            if stamp is not None:
+                with open(self.filename, 'rb') as file:
+                    data = file.read()
+            digest = hashlib.sha1(data).hexdigest()
+            self.stamp = stamp
+            if digest == self.current.digest:
+                return False
+            try:
+                doctors = json.loads(data)["doctors"] if data.strip() else []
+            except (ValueError, KeyError, TypeError):
+                # A half-written file keeps the last good version; retry on the next change
+                self.stamp = None
+                return False
+            self.current = DoctorSnapshot(doctors, digest)
+            self.changed.set()
+            return True
+
+    def subscribe(self, callback):
+        """Call callback(snapshot) on the watch thread whenever the doctors change"""
+        self.subscribers.append(callback)
+
+    def watch(self, interval=2.0):
+        """Poll the file every interval seconds on a background thread and notify subscribers"""
+        def poll():
+            published = self.current
+            while True:
+                self.changed.wait(interval)
+                self.changed.clear()
+                self.refresh()
+                snapshot = self.current
+                if snapshot is published:
+                    continue
+                published = snapshot
+                for callback in self.subscribers:
+                    try:
+                        callback(snapshot)
+                    except Exception as e:
+                        print(f"Error reloading doctors: {str(e)}")
+
+        threading.Thread(target=poll, daemon=True).start()
+
+    def _stamp(self):
+        try:
+            stat = os.stat(self.filename)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def snapshot(self):
+        """The current DoctorSnapshot, re-reading the file first if it changed"""
+        self.refresh()
+        return self.current
+
+    def all(self):
+        """All doctors, in file order"""
+        return self.snapshot().doctors
+
+    def get(self, doctor_id):
+        """The doctor with this id, if any"""
+        return self.snapshot().by_id.get(str(doctor_id))
+
+    def with_specialty(self, specialty):
+        """Doctors whose specialty matches exactly (case-insensitive)"""
+        return self.snapshot().by_specialty.get(specialty.lower(), [])
+
+    def specialties(self):
+        """Distinct specialty names, in file order"""
+        return self.snapshot().specialties
+
+    def canonical_specialty(self, specialty):
+        """
+        The doctor.json specialty a free-text specialty refers to.
+
+        Uses the same matching as specialists(), so the result always has
+        doctors behind it; falls back to GENERAL_PHYSICIAN.
+        """
+        snapshot = self.snapshot()
+        doctor_ids = snapshot.match_specialty(specialty)
+        if doctor_ids:
+            return snapshot.by_id[doctor_ids[0]]["specialty"]
+        return GENERAL_PHYSICIAN
+
+    def specialists(self, specialty):
+        """
+        Doctors for a free-text specialty, such as one recommended by the LLM.
+
+        Falls back to the general physicians when nothing matches.
+        """
+        snapshot = self.snapshot()
+        doctor_ids = (snapshot.match_specialty(specialty)
+                      or snapshot.specialty_index.get(normalize_term(GENERAL_PHYSICIAN), []))
+        return [snapshot.by_id[doctor_id] for doctor_id in doctor_ids]
+
+    def display_names(self):
+        """Doctor ids mapped to "Name (Specialty)" strings"""
+        return self.snapshot().display_names
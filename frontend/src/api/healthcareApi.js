@@ -75,14 +75,40 @@ const healthcareApi = {
     return apiCall('/api/cancel-appointment', 'POST', identifier);
   },
 
+  // Get a single appointment by its id
+  getAppointment: (appointmentId) => {
+    return apiCall(`/api/appointments/${appointmentId}`);
+  },
+
+  // Cancel a single appointment by its id
+  deleteAppointment: (appointmentId) => {
+    return apiCall(`/api/appointments/${appointmentId}`, 'DELETE');
+  },
+
   // Get available doctors
   getDoctors: () => {
     return apiCall('/api/doctors');
   },
 
   // Get available appointment slots
-  getAvailableSlots: () => {
-    return apiCall('/api/available-slots');
+  getAvailableSlots: (doctorId, { specialty, from, to } = {}) => {
+    const params = new URLSearchParams();
+    if (doctorId) params.append('doctor_id', doctorId);
+    if (specialty) params.append('specialty', specialty);
+    if (from) params.append('from', from);
+    if (to) params.append('to', to);
+    const query = params.toString();
+    return apiCall(`/api/available-slots${query ? `?${query}` : ''}`);
+  },
+
+  // Get the soonest free slots for a specialty and/or doctors
+  getEarliestSlots: ({ specialty, doctorIds = [], limit, from } = {}) => {
+    const params = new URLSearchParams();
+    if (specialty) params.append('specialty', specialty);
+    doctorIds.forEach((id) => params.append('doctor_id', id));
+    if (limit) params.append('limit', limit);
+    if (from) params.append('from', from);
+    return apiCall(`/api/earliest-slots?${params.toString()}`);
   },
 
   // Check symptoms
@@ -116,8 +142,8 @@ const healthcareApi = {
   },
   
   // Get doctor's appointments
-  getDoctorAppointments: (doctorId) => {
-    return apiCall('/api/doctor/appointments', 'POST', { doctor_id: doctorId });
+  getDoctorAppointments: (doctorId, options = {}) => {
+    return apiCall('/api/doctor/appointments', 'POST', { doctor_id: doctorId, ...options });
   },
   
   // Send email
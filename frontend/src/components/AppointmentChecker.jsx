@@ -122,7 +122,7 @@ const AppointmentChecker = () => {
         if (appointments.length > 0) {
           // If we have a list of appointments, remove the cancelled one
           if (appointmentId !== null) {
-            setAppointments(prev => prev.filter((_, index) => index !== appointmentId));
+            setAppointments(prev => prev.filter(a => a.id !== appointmentId));
           }
           // If we just cancelled the selected appointment, clear it
           if (selectedAppointment) {
@@ -282,9 +282,7 @@ const AppointmentChecker = () => {
                 <p className="text-red-600 mb-3">Are you sure you want to cancel this appointment?</p>
                 <div className="flex space-x-2">
                   <button
-                    onClick={() => cancelAppointment(appointments.findIndex(a => 
-                      a.appointment_date === selectedAppointment.appointment_date && 
-                      a.appointment_time === selectedAppointment.appointment_time))}
+                    onClick={() => cancelAppointment(selectedAppointment.id ?? null)}
                     disabled={loading}
                     className="w-1/2 py-2 px-4 bg-red-600 text-white rounded-md hover:bg-red-700"
                   >
@@ -22,25 +22,44 @@ const BookAppointmentForm = ({ onSuccess, initialData = {} }) => {
   const [availableSlots, setAvailableSlots] = useState({});
   const [selectedDate, setSelectedDate] = useState('');
   const [availableTimes, setAvailableTimes] = useState([]);
+  const [slotsVersion, setSlotsVersion] = useState(0);
   
-  // Fetch doctors and available slots
+  // Fetch doctors; slots are loaded once a doctor is chosen
   useEffect(() => {
     const fetchData = async () => {
       try {
         const doctorsResponse = await healthcareApi.getDoctors();
         setDoctors(doctorsResponse.doctors || {});
-        
-        const slotsResponse = await healthcareApi.getAvailableSlots();
-        setAvailableSlots(slotsResponse.available_slots || {});
       } catch (error) {
         console.error('Error fetching data:', error);
-        setError('Failed to load doctors and available slots');
+        setError('Failed to load doctors');
       }
     };
     
     fetchData();
   }, []);
   
+  // Each doctor has their own free slots
+  useEffect(() => {
+    const doctorId = Object.keys(doctors).find((id) => doctors[id] === formData.doctor);
+    if (!doctorId) {
+      setAvailableSlots({});
+      return;
+    }
+    
+    const fetchSlots = async () => {
+      try {
+        const slotsResponse = await healthcareApi.getAvailableSlots(doctorId);
+        setAvailableSlots(slotsResponse.available_slots || {});
+      } catch (error) {
+        console.error('Error fetching slots:', error);
+        setError('Failed to load available slots');
+      }
+    };
+    
+    fetchSlots();
+  }, [formData.doctor, doctors, slotsVersion]);
+  
   // Update available times when date changes
   useEffect(() => {
     if (selectedDate && availableSlots[selectedDate]) {
@@ -58,6 +77,11 @@ const BookAppointmentForm = ({ onSuccess, initialData = {} }) => {
       setSelectedDate(value);
       setFormData(prev => ({ ...prev, appointment_time: '' }));
     }
+    
+    if (name === 'doctor') {
+      setSelectedDate('');
+      setFormData(prev => ({ ...prev, appointment_date: '', appointment_time: '' }));
+    }
   };
   
   const handleFileSelected = (file) => {
@@ -137,7 +161,14 @@ const BookAppointmentForm = ({ onSuccess, initialData = {} }) => {
       }
     } catch (error) {
       console.error('Error booking appointment:', error);
-      setError('An error occurred while booking your appointment');
+      if (error.message.includes('409')) {
+        // Someone else booked this slot first; reload the free times
+        setError('That time slot has just been booked. Please choose another time.');
+        setFormData(prev => ({ ...prev, appointment_time: '' }));
+        setSlotsVersion(version => version + 1);
+      } else {
+        setError('An error occurred while booking your appointment');
+      }
     } finally {
       setLoading(false);
     }
@@ -7,6 +7,7 @@ const DoctorPortal = () => {
   const [specialty, setSpecialty] = useState('');
   const [password, setPassword] = useState('');
   const [appointments, setAppointments] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [error, setError] = useState('');
   const [success, setSuccess] = useState('');
   const [loading, setLoading] = useState(false);
@@ -60,8 +61,8 @@ const DoctorPortal = () => {
     }
   };
   
-  // Function to fetch appointments
-  const fetchAppointments = async (id) => {
+  // Function to fetch appointments, one page at a time
+  const fetchAppointments = async (id, cursor = null) => {
     setLoading(true);
     setError('');
     setSuccess('');
@@ -72,14 +73,18 @@ const DoctorPortal = () => {
           'Content-Type': 'application/json',
         },
         body: JSON.stringify({ 
-          doctor_id: id
+          doctor_id: id,
+          cursor
         }),
       });
       
       const data = await response.json();
       
       if (response.ok && data.success) {
-        setAppointments(data.appointments || []);
+        const page = data.appointments || [];
+        // Append later pages to the ones already loaded
+        setAppointments(prev => (cursor ? [...prev, ...page] : page));
+        setNextCursor(data.next_cursor || null);
       } else {
         setError(data.message || 'Failed to fetch appointments');
       }
@@ -155,24 +160,18 @@ const DoctorPortal = () => {
   const handleCancelAppointment = async () => {
     setCancelling(true);
     try {
-      const response = await fetch(`${API_BASE_URL}/api/cancel-appointment`, {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify({
-          appointment_id: selectedAppointment.id,
-          reason: cancelReason
-        }),
+      const response = await fetch(`${API_BASE_URL}/api/appointments/${selectedAppointment.id}`, {
+        method: 'DELETE',
       });
 
       const data = await response.json();
 
-      if (response.ok) {
+      if (response.ok && data.success) {
         setSuccess('Appointment cancelled successfully');
         setError('');
         closeCancelModal();
-        fetchAppointments();
+        // Drop the cancelled appointment locally instead of refetching the list
+        setAppointments(prev => prev.filter(a => a.id !== selectedAppointment.id));
         closeAppointmentDetails();
       } else {
         setError(data.message || 'Failed to cancel appointment');
@@ -193,6 +192,7 @@ const DoctorPortal = () => {
     setDoctorName('');
     setSpecialty('');
     setAppointments([]);
+    setNextCursor(null);
     setSelectedAppointment(null);
   };
 
@@ -516,7 +516,7 @@ const DoctorPortal = () => {
                     <tbody className="bg-white divide-y divide-gray-200">
                       {appointments.map((appointment, index) => (
                         <tr 
-                          key={index} 
+                          key={appointment.id || index} 
                           onClick={() => handleAppointmentClick(appointment)}
                           className="hover:bg-gray-50 cursor-pointer transition-colors duration-150"
                         >
@@ -548,6 +548,17 @@ const DoctorPortal = () => {
                       ))}
                     </tbody>
                   </table>
+                  {nextCursor && (
+                    <div className="p-4 bg-gray-50 text-center">
+                      <button
+                        onClick={() => fetchAppointments(doctorId, nextCursor)}
+                        disabled={loading}
+                        className="px-4 py-2 bg-gray-200 text-gray-800 rounded hover:bg-gray-300"
+                      >
+                        {loading ? 'Loading...' : 'Load more'}
+                      </button>
+                    </div>
+                  )}
                 </div>
               )}
             </>
@@ -0,0 +1,141 @@
+import bisect
+import itertools
+
+
+class AppointmentIndex:
+    """
+    Secondary indexes over the in-memory appointment list.
+
+    Keeps hash indexes by appointment id, email, phone and doctor id plus a per-doctor list
+    ordered by appointment date and time. The store calls add/remove on every
+    mutation so the indexes never need rebuilding.
+    """
+
+    def __init__(self, resolve_doctor):
+        self.resolve_doctor = resolve_doctor
+        self.by_id = {}
+        self.by_email = {}
+        self.by_phone = {}
+        self.by_doctor = {}
+        self.schedules = {}
+        self.order = {}
+        self.keys = {}
+        self.counter = itertools.count()
+
+    def rebuild(self, records):
+        """Index a freshly loaded list of records"""
+        self.by_id.clear()
+        self.by_email.clear()
+        self.by_phone.clear()
+        self.by_doctor.clear()
+        self.schedules.clear()
+        self.order.clear()
+        self.keys.clear()
+        for record in records:
+            self.add(record)
+
+    def add(self, record):
+        """Index a new record"""
+        order = next(self.counter)
+        self.order[id(record)] = order
+        if record.get("id"):
+            self.by_id[record["id"]] = record
+        if record.get("email"):
+            self.by_email.setdefault(record["email"], []).append(record)
+        if record.get("phone"):
+            self.by_phone.setdefault(record["phone"], []).append(record)
+
+        doctor_id = self.resolve_doctor(record)
+        if doctor_id is not None:
+            self.by_doctor.setdefault(doctor_id, []).append(record)
+            key = self.schedule_key(record)
+            self.keys[id(record)] = (doctor_id, key)
+            keys, records = self.schedules.setdefault(doctor_id, ([], []))
+            position = bisect.bisect(keys, key)
+            keys.insert(position, key)
+            records.insert(position, record)
+
+    def remove(self, record):
+        """Drop a record from every index"""
+        if self.by_id.get(record.get("id")) is record:
+            del self.by_id[record["id"]]
+        self._discard(self.by_email, record.get("email"), record)
+        self._discard(self.by_phone, record.get("phone"), record)
+
+        indexed = self.keys.pop(id(record), None)
+        if indexed is not None:
+            doctor_id, key = indexed
+            self._discard(self.by_doctor, doctor_id, record)
+            keys, records = self.schedules[doctor_id]
+            position = bisect.bisect_left(keys, key)
+            del keys[position]
+            del records[position]
+        self.order.pop(id(record), None)
+
+    def _discard(self, index, value, record):
+        bucket = index.get(value)
+        if not bucket:
+            return
+        for i, candidate in enumerate(bucket):
+            if candidate is record:
+                del bucket[i]
+                break
+        if not bucket:
+            del index[value]
+
+    def schedule_key(self, record):
+        """Sort key of a record within its doctor's schedule"""
+        return (record.get("appointment_date") or "", record.get("appointment_time") or "", record.get("id") or "")
+
+    def get(self, appointment_id):
+        """Return the record with this appointment id, if any"""
+        return self.by_id.get(appointment_id)
+
+    def find(self, email=None, phone=None):
+        """Return records matching the email or the phone, in insertion order"""
+        by_email = self.by_email.get(email, []) if email else []
+        by_phone = self.by_phone.get(phone, []) if phone else []
+        if not by_phone:
+            return list(by_email)
+        if not by_email:
+            return list(by_phone)
+        merged = {id(record): record for record in by_email + by_phone}
+        return sorted(merged.values(), key=lambda record: self.order[id(record)])
+
+    def for_doctor(self, doctor_id):
+        """Return a doctor's records in insertion order"""
+        return list(self.by_doctor.get(doctor_id, []))
+
+    def schedule(self, doctor_id, date_from=None, date_to=None):
+        """Return a doctor's records ordered by date and time, optionally within a date range"""
+        keys, records = self.schedules.get(doctor_id, ([], []))
+        start, end = self._range(keys, date_from, date_to)
+        return records[start:end]
+
+    def schedule_page(self, doctor_id, date_from=None, date_to=None, after=None, limit=50, descending=False):
+        """
+        Return one page of a doctor's schedule and the key to continue from.
+
+        ``after`` is the key returned for the previous page; the next key is
+        None once the range is exhausted.
+        """
+        keys, records = self.schedules.get(doctor_id, ([], []))
+        start, end = self._range(keys, date_from, date_to)
+        if descending:
+            if after is not None:
+                end = min(end, bisect.bisect_left(keys, tuple(after)))
+            page_start = max(start, end - limit)
+            page = records[page_start:end][::-1]
+            more = page_start > start
+        else:
+            if after is not None:
+                start = max(start, bisect.bisect_right(keys, tuple(after)))
+            page = records[start:min(start + limit, end)]
+            more = start + limit < end
+        next_key = list(self.schedule_key(page[-1])) if page and more else None
+        return page, next_key
+
+    def _range(self, keys, date_from, date_to):
+        start = bisect.bisect_left(keys, (date_from,)) if date_from else 0
+        end = bisect.bisect_right(keys, (date_to, "\uffff")) if date_to else len(keys)
+        return start, end
@@ -0,0 +1,127 @@
+import json
+import asyncio
+import threading
+import weakref
+
+
+class LLMPool:
+    """
+    Process-wide pool of chat model clients.
+
+    get() hands out one client per model class and settings, created on
+    first use and then shared by every caller. A Gemini client holds its own
+    connection to the API, so sharing it means sessions reuse the same
+    kept-alive connection instead of each paying setup and opening its own.
+
+    Clients from the pool are bounded: at most max_concurrency model calls
+    run at once from threads, and at most max_concurrency from each event
+    loop; further calls wait for a slot. Calls and waits are counted for
+    stats().
+    """
+
+    def __init__(self, max_concurrency=64):
+        self.max_concurrency = max_concurrency
+        self.clients = {}
+        self.classes = {}
+        self.lock = threading.Lock()
+        self.slots = threading.BoundedSemaphore(max_concurrency)
+        self.loop_slots = weakref.WeakKeyDictionary()
+        self.in_flight = 0
+        self.calls = 0
+        self.waits = 0
+
+    def get(self, model_class, **settings):
+        """The shared client of model_class built with settings, creating it on first use"""
+        key = (model_class, json.dumps(settings, sort_keys=True, default=str))
+        with self.lock:
+            client = self.clients.get(key)
+            if client is None:
+                bounded = self.classes.get(model_class)
+                if bounded is None:
+                    bounded = self.classes[model_class] = self.bounded(model_class)
+                client = self.clients[key] = bounded(**settings)
+            return client
+
+    def bounded(self, model_class):
+        """Subclass of a chat model whose calls hold one of the pool's slots"""
+        pool = self
+
+        class Bounded(model_class):
+            def _generate(self, *args, **kwargs):
+                with pool.slot():
+                    return super()._generate(*args, **kwargs)
+
+            async def _agenerate(self, *args, **kwargs):
+                async with pool.async_slot():
+                    return await super()._agenerate(*args, **kwargs)
+
+            def _stream(self, *args, **kwargs):
+                with pool.slot():
+                    yield from super()._stream(*args, **kwargs)
+
+            async def _astream(self, *args, **kwargs):
+                async with pool.async_slot():
+                    async for chunk in super()._astream(*args, **kwargs):
+                        yield chunk
+
+        Bounded.__name__ = Bounded.__qualname__ = model_class.__name__
+        return Bounded
+
+    def slot(self):
+        """Context manager holding a slot for a model call made from a thread"""
+        return PoolSlot(self, self.slots)
+
+    def async_slot(self):
+        """Async context manager holding a slot for a model call made on the running event loop"""
+        loop = asyncio.get_running_loop()
+        with self.lock:
+            slots = self.loop_slots.get(loop)
+            if slots is None:
+                slots = self.loop_slots[loop] = asyncio.BoundedSemaphore(self.max_concurrency)
+        return PoolSlot(self, slots)
+
+    def count(self, waited, delta):
+        """Record a call taking (delta 1) or giving back (delta -1) a slot"""
+        with self.lock:
+            self.in_flight += delta
+            if delta > 0:
+                self.calls += 1
+                self.waits += waited
+
+    def stats(self):
+        """Clients and call counters, for monitoring"""
+        with self.lock:
+            return {
+                "clients": len(self.clients),
+                "max_concurrency": self.max_concurrency,
+                "in_flight": self.in_flight,
+                "calls": self.calls,
+                "waits": self.waits
+            }
+
+
+class PoolSlot:
+    """One model call's hold on an LLMPool semaphore, threading or asyncio"""
+
+    def __init__(self, pool, semaphore):
+        self.pool = pool
+        self.semaphore = semaphore
+
+    def __enter__(self):
+        waited = not self.semaphore.acquire(blocking=False)
+        if waited:
+            self.semaphore.acquire()
+        self.pool.count(waited, 1)
+
+    def __exit__(self, *exc_info):
+        self.pool.count(False, -1)
+        self.semaphore.release()
+
+    async def __aenter__(self):
+        waited = self.semaphore.locked()
+        await self.semaphore.acquire()
+        self.pool.count(waited, 1)
+
+    async def __aexit__(self, *exc_info):
+        self.pool.count(False, -1)
+        self.semaphore.release()
@@ -0,0 +1,168 @@
+import re
+import sys
+
+
+DATE_PATTERN = re.compile(r'^(\d{4})-(\d{2})-(\d{2})$')
+TIME_PATTERN = re.compile(r'^(\d{2}):(\d{2})$')
+SCHEDULE = frozenset(("appointment_date", "appointment_time"))
+
+
+class AppointmentRecord:
+    """
+    Compact in-memory form of an appointment.
+
+    Fields live in __slots__ instead of a per-record dict, the doctor strings
+    are interned so every record shares one copy, and the appointment date and
+    time are packed into a single integer (YYYYMMDDHHMM). Reads through
+    ``record["field"]`` / ``record.get("field")`` see the same values as the
+    JSON shape; use to_dict() when a record leaves the process.
+    """
+
+    __slots__ = ("id", "name", "email", "phone", "age", "gender", "reason",
+                 "doctor", "doctor_id", "starts_at", "medical_history_file", "extra")
+
+    # JSON keys stored directly in a slot of the same name
+    FIELDS = frozenset(("id", "name", "email", "phone", "age", "gender", "reason",
+                        "doctor", "doctor_id", "medical_history_file"))
+    INTERNED = frozenset(("age", "gender", "doctor", "doctor_id"))
+    KEY_ORDER = ("id", "name", "email", "phone", "age", "gender", "reason", "doctor", "doctor_id",
+                 "appointment_date", "appointment_time", "medical_history_file")
+
+    def __init__(self):
+        self.id = self.name = self.email = self.phone = self.age = self.gender = None
+        self.reason = self.doctor = self.doctor_id = self.starts_at = None
+        self.medical_history_file = self.extra = None
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build a record from the JSON shape of an appointment"""
+        record = cls()
+        for key, value in data.items():
+            if key in cls.FIELDS:
+                if key in cls.INTERNED and isinstance(value, str):
+                    value = sys.intern(value)
+                setattr(record, key, value)
+            elif key not in SCHEDULE:
+                if record.extra is None:
+                    record.extra = {}
+                record.extra[key] = value
+        record._pack(data.get("appointment_date"), data.get("appointment_time"))
+        return record
+
+    def to_dict(self):
+        """Return the JSON shape of this appointment"""
+        data = {}
+        for key in self.KEY_ORDER:
+            value = self.get(key)
+            if value is not None:
+                data[key] = value
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    @property
+    def appointment_date(self):
+        if self.starts_at is None:
+            return self.extra.get("appointment_date") if self.extra else None
+        day = self.starts_at // 10000
+        return f"{day // 10000:04d}-{day // 100 % 100:02d}-{day % 100:02d}"
+
+    @property
+    def appointment_time(self):
+        if self.starts_at is None:
+            return self.extra.get("appointment_time") if self.extra else None
+        minutes = self.starts_at % 10000
+        return f"{minutes // 100:02d}:{minutes % 100:02d}"
+
+    def __getitem__(self, key):
+        if key in self.FIELDS or key in SCHEDULE:
+            return self.get(key)
+        if self.extra and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        if key in self.FIELDS:
+            value = getattr(self, key)
+        elif key == "appointment_date":
+            value = self.appointment_date
+        elif key == "appointment_time":
+            value = self.appointment_time
+        else:
+            value = self.extra.get(key) if self.extra else None
+        return default if value is None else value
+
+    def __contains__(self, key):
+        if key in self.FIELDS or key in SCHEDULE:
+            return self.get(key) is not None
+        return bool(self.extra) and key in self.extra
+
+    def __setitem__(self, key, value):
+        if key in self.FIELDS:
+            if key in self.INTERNED and isinstance(value, str):
+                value = sys.intern(value)
+            setattr(self, key, value)
+        elif key in SCHEDULE:
+            self._set_schedule(key, value)
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = value
+
+    def update(self, changes):
+        for key, value in changes.items():
+            self[key] = value
+
+    def _set_schedule(self, key, value):
+        # Unpack to the raw strings, apply the change, then try to pack again
+        date = self.appointment_date
+        time = self.appointment_time
+        if key == "appointment_date":
+            date = value
+        else:
+            time = value
+
+        if self.extra:
+            self.extra.pop("appointment_date", None)
+            self.extra.pop("appointment_time", None)
+        self._pack(date, time)
+        if not self.extra:
+            self.extra = None
+
+    def _pack(self, date, time):
+        date_match = DATE_PATTERN.match(date) if isinstance(date, str) else None
+        time_match = TIME_PATTERN.match(time) if isinstance(time, str) else None
+        if date_match and time_match:
+            year, month, day = date_match.groups()
+            hour, minute = time_match.groups()
+            self.starts_at = int(year + month + day + hour + minute)
+        else:
+            # Values that don't fit the packed form are kept verbatim
+            self.starts_at = None
+            if date is None and time is None:
+                return
+            if self.extra is None:
+                self.extra = {}
+            if date is not None:
+                self.extra["appointment_date"] = date
+            if time is not None:
+                self.extra["appointment_time"] = time
+
+    def __eq__(self, other):
+        if isinstance(other, AppointmentRecord):
+            return self.to_dict() == other.to_dict()
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    __hash__ = object.__hash__
+
+    def __repr__(self):
+        return f"AppointmentRecord({self.to_dict()!r})"
+
+
+def as_record(appointment):
+    """Return the appointment as an AppointmentRecord"""
+    if isinstance(appointment, AppointmentRecord):
+        return appointment
+    return AppointmentRecord.from_dict(appointment)
@@ -0,0 +1,433 @@
+import bisect
+import heapq
+import itertools
+import threading
+from time import monotonic, sleep
+from datetime import datetime, timedelta, timezone
+
+
+WEEKDAYS = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+
+
+class SlotInventory:
+    """
+    Free appointment slots for each doctor and date.
+
+    Every slot time offered by any doctor forms one shared grid, and each
+    doctor-day is an integer bitmap over it (bit i set = grid time i is free).
+    A doctor's weekly availability from doctor.json becomes one mask per
+    weekday, so opening a day is a lookup and checking, reserving or counting
+    free slots are bit operations.
+
+    Reservations are compare-and-set under a lock striped by doctor-day, so
+    concurrent bookings for different doctors or days rarely contend and a
+    slot can never be handed out twice.
+
+    The inventory covers a rolling window of ``horizon`` days starting
+    tomorrow. advance() moves it forward, opening only the days that enter
+    the window and dropping the ones that leave it.
+
+    Slots can also be held for a while on behalf of an owner (a chat session)
+    while they decide. Held slots are reserved like booked ones; a single
+    timer thread releases them from an expiry heap once their TTL passes.
+    At most ``day_hold_limit`` slots of a doctor-day are held at any time,
+    whoever holds them, so sessions - even abandoned or hostile ones - can
+    never keep the rest of the day from being booked.
+
+    When doctors or their availability change, reload() builds a successor
+    inventory and hands over the live bookings and holds. The old inventory
+    stays readable as it was, and forwards any later changes to its successor.
+    """
+
+    def __init__(self, doctors, horizon=7, today=None, stripes=64, hold_ttl=120, generations=None,
+                 day_hold_limit=2):
+        availability = {str(doctor["id"]): doctor.get("availability") or {} for doctor in doctors}
+        self.times = sorted({time for weekly in availability.values()
+                             for times in weekly.values() for time in times})
+        self.bits = {time: 1 << i for i, time in enumerate(self.times)}
+
+        # Mask of bookable times for each doctor and weekday (Monday = 0)
+        self.weekly = {}
+        for doctor_id, weekly in availability.items():
+            masks = [0] * len(WEEKDAYS)
+            for day, times in weekly.items():
+                if day.lower() in WEEKDAYS:
+                    masks[WEEKDAYS.index(day.lower())] = self.mask(times)
+            self.weekly[doctor_id] = masks
+
+        self.locks = [threading.Lock() for _ in range(stripes)]
+        self.free = {}
+        self.dates = []
+        self.horizon = horizon
+        self.window_lock = threading.Lock()
+        # Bookings on days past the window, applied when each day opens
+        self.booked_ahead = {}
+        # Cleared while bookings are being loaded; reservations wait for it
+        self.ready = threading.Event()
+        self.ready.set()
+
+        self.hold_ttl = hold_ttl
+        self.day_hold_limit = day_hold_limit
+        self.holds = {}
+        self.owned = {}
+        self.expiry = []
+        self.hold_cond = threading.Condition()
+        self.expirer = None
+        self.rollover = False
+        # Set once reload() has replaced this inventory
+        self.successor = None
+
+        # Bumped on every change, so readers can tell when cached views are stale;
+        # a successor keeps counting where its predecessor left off
+        self.generations = generations or itertools.count(1)
+        self.generation = 0
+        self.modified = datetime.now(timezone.utc)
+        self.advance(today)
+
+    def advance(self, today=None):
+        """Move the window to start the day after today, opening and retiring days as needed"""
+        today = today or datetime.now().date()
+        first = today + timedelta(days=1)
+        last = today + timedelta(days=self.horizon)
+        with self.window_lock:
+            dates = self.dates
+            first_date = first.strftime("%Y-%m-%d")
+            retired = [date for date in dates if date < first_date]
+
+            day = first
+            if len(retired) < len(dates):
+                day = max(first, datetime.strptime(dates[-1], "%Y-%m-%d").date() + timedelta(days=1))
+            opened = []
+            while day <= last:
+                opened.append(self.open_day(day))
+                day += timedelta(days=1)
+
+            # Readers iterate self.dates, so it is replaced rather than edited
+            self.dates = dates[len(retired):] + opened
+            for date in retired:
+                for doctor_id in self.weekly:
+                    key = (doctor_id, date)
+                    with self._lock(key):
+                        self.free.pop(key, None)
+            if opened or retired:
+                self._changed()
+        return opened, retired
+
+    def open_day(self, day):
+        """Make every doctor's slots on a day free and return its date string"""
+        date = day.strftime("%Y-%m-%d")
+        for doctor_id, masks in self.weekly.items():
+            if masks[day.weekday()]:
+                key = (doctor_id, date)
+                with self._lock(key):
+                    self.free[key] = masks[day.weekday()] & ~self.booked_ahead.pop(key, 0)
+        return date
+
+    def load_bookings(self, records, resolve_doctor):
+        """Mark the slots of stored appointment records as booked, in a single pass"""
+        # Records carry the packed start time; the few distinct days, times
+        # and doctors are decoded once each rather than once per record
+        days = {}
+        bits = {}
+        doctors = {}
+        booked = {}
+        for record in records:
+            starts_at = record.starts_at
+            if starts_at is None:
+                continue
+            day, minutes = divmod(starts_at, 10000)
+            bit = bits.get(minutes)
+            if bit is None:
+                bit = bits[minutes] = self.bits.get(f"{minutes // 100:02d}:{minutes % 100:02d}", 0)
+            doctor = (record.doctor_id, record.doctor)
+            if doctor not in doctors:
+                doctor_id = resolve_doctor(record)
+                doctors[doctor] = None if doctor_id is None else str(doctor_id)
+            doctor_id = doctors[doctor]
+            if not bit or doctor_id is None:
+                continue
+            date = days.get(day)
+            if date is None:
+                date = days[day] = f"{day // 10000:04d}-{day // 100 % 100:02d}-{day % 100:02d}"
+            key = (doctor_id, date)
+            booked[key] = booked.get(key, 0) | bit
+
+        with self.window_lock:
+            last_date = self.dates[-1] if self.dates else ""
+            for key, mask in booked.items():
+                with self._lock(key):
+                    if key in self.free:
+                        self.free[key] &= ~mask
+                    elif key[1] and key[1] > last_date:
+                        self.booked_ahead[key] = self.booked_ahead.get(key, 0) | mask
+            self._changed()
+        return len(booked)
+
+    def reload(self, doctors, records, resolve_doctor):
+        """
+        Build the inventory for a new doctor list and hand this one's state to it.
+
+        Slot times a doctor already offered keep their live state from this
+        inventory (booked, held or free); newly offered times are checked
+        against the stored appointment records. Changes are paused only while
+        that state is copied over; afterwards this inventory forwards them to
+        the successor, which is returned.
+        """
+        today = None
+        if self.dates:
+            today = self._day(self.dates[0]) - timedelta(days=1)
+        successor = SlotInventory(doctors, self.horizon, today, len(self.locks), self.hold_ttl,
+                                  self.generations, self.day_hold_limit)
+        # The slow pass over every record runs before anything is paused
+        successor.load_bookings(records, resolve_doctor)
+
+        with self.hold_cond, self.window_lock:
+            for lock in self.locks:
+                lock.acquire()
+            try:
+                for key, mask in successor.free.items():
+                    if key in self.free:
+                        weekday = self._day(key[1]).weekday()
+                        offered = self._remap(self.weekly[key[0]][weekday], successor)
+                        kept = self._remap(self.free[key], successor)
+                        successor.free[key] = mask & ~offered | kept & successor.weekly[key[0]][weekday]
+                for key, mask in self.booked_ahead.items():
+                    if key[0] in successor.weekly:
+                        offered = self._remap(self.weekly[key[0]][self._day(key[1]).weekday()], successor)
+                        booked = successor.booked_ahead.get(key, 0) & ~offered | self._remap(mask, successor)
+                        if booked:
+                            successor.booked_ahead[key] = booked
+                successor.holds, successor.owned, successor.expiry = self.holds, self.owned, self.expiry
+                self.holds, self.owned, self.expiry = {}, {}, []
+                self.successor = successor
+            finally:
+                for lock in self.locks:
+                    lock.release()
+
+        if successor.holds:
+            successor.expirer = threading.Thread(target=successor._expire_holds, daemon=True)
+            successor.expirer.start()
+        if self.rollover:
+            successor.start_rollover()
+        successor._changed()
+        return successor
+
+    def _remap(self, mask, other):
+        # Grid positions differ between inventories, so masks are carried over by time
+        return other.mask(self.times_in(mask))
+
+    @staticmethod
+    def _day(date):
+        return datetime.strptime(date, "%Y-%m-%d").date()
+
+    def start_rollover(self):
+        """Advance the window just after every midnight on a background thread"""
+        def rollover():
+            while self.successor is None:
+                now = datetime.now()
+                midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+                sleep((midnight - now).total_seconds() + 1)
+                if self.successor is None:
+                    self.advance()
+
+        self.rollover = True
+        threading.Thread(target=rollover, daemon=True).start()
+
+    def mask(self, times):
+        """Bitmap of the given slot times"""
+        mask = 0
+        for time in times:
+            mask |= self.bits.get(time, 0)
+        return mask
+
+    def times_in(self, mask):
+        """Slot times set in a bitmap, in time order"""
+        times = []
+        while mask:
+            low = mask & -mask
+            times.append(self.times[low.bit_length() - 1])
+            mask ^= low
+        return times
+
+    def is_free(self, doctor_id, date, time):
+        """Whether a doctor's slot is still free"""
+        bit = self.bits.get(time, 0)
+        return bool(self.free.get((str(doctor_id), date), 0) & bit)
+
+    def free_times(self, doctor_id, date):
+        """A doctor's free slot times on a date"""
+        return self.times_in(self.free.get((str(doctor_id), date), 0))
+
+    def free_dates(self, doctor_id):
+        """Dates on which a doctor has at least one free slot"""
+        doctor_id = str(doctor_id)
+        return [date for date in self.dates if self.free.get((doctor_id, date))]
+
+    def free_slots(self, doctor_id, date_from=None, date_to=None):
+        """A doctor's free slots as {date: [times]}, optionally within a date range"""
+        doctor_id = str(doctor_id)
+        slots = {}
+        for date in self._dates_between(date_from, date_to):
+            mask = self.free.get((doctor_id, date), 0)
+            if mask:
+                slots[date] = self.times_in(mask)
+        return slots
+
+    def count_free(self, doctor_id, date_from=None, date_to=None):
+        """Number of free slots a doctor has, optionally within a date range"""
+        doctor_id = str(doctor_id)
+        return sum(bin(self.free.get((doctor_id, date), 0)).count("1")
+                   for date in self._dates_between(date_from, date_to))
+
+    def earliest(self, doctor_ids, limit=5, date_from=None):
+        """
+        The next free slots across a set of doctors, soonest first.
+
+        Returns up to limit (date, time, doctor_id) tuples. Each doctor's free
+        slots are generated lazily in date and time order and merged through
+        a heap, so only as many doctor-days are read as the answer needs.
+        """
+        dates = self.dates
+        if date_from:
+            dates = dates[bisect.bisect_left(dates, date_from):]
+        streams = [self._free_in_order(str(doctor_id), dates) for doctor_id in doctor_ids]
+        return list(itertools.islice(heapq.merge(*streams), limit))
+
+    def _free_in_order(self, doctor_id, dates):
+        for date in dates:
+            mask = self.free.get((doctor_id, date), 0)
+            while mask:
+                low = mask & -mask
+                yield date, self.times[low.bit_length() - 1], doctor_id
+                mask ^= low
+
+    def union(self, doctor_ids=None, date_from=None, date_to=None):
+        """Times free with any of the doctors (default: all), as {date: [times]}"""
+        doctor_ids = list(self.weekly) if doctor_ids is None else [str(doctor_id) for doctor_id in doctor_ids]
+        slots = {}
+        for date in self._dates_between(date_from, date_to):
+            mask = 0
+            for doctor_id in doctor_ids:
+                mask |= self.free.get((doctor_id, date), 0)
+            if mask:
+                slots[date] = self.times_in(mask)
+        return slots
+
+    def reserve(self, doctor_id, date, time):
+        """Book a slot if it is still free; returns False if it was not"""
+        key = (str(doctor_id), date)
+        bit = self.bits.get(time, 0)
+        self.ready.wait()
+        with self._lock(key):
+            if self.successor:
+                return self.successor.reserve(doctor_id, date, time)
+            mask = self.free.get(key, 0)
+            if not mask & bit:
+                return False
+            self.free[key] = mask & ~bit
+        self._changed()
+        return True
+
+    def release(self, doctor_id, date, time):
+        """Make a booked slot free again"""
+        key = (str(doctor_id), date)
+        bit = self.bits.get(time, 0)
+        with self._lock(key):
+            if self.successor:
+                return self.successor.release(doctor_id, date, time)
+            if key[0] not in self.weekly or not date:
+                return
+            if key in self.free:
+                weekday = datetime.strptime(date, "%Y-%m-%d").weekday()
+                self.free[key] |= bit & self.weekly[key[0]][weekday]
+            elif key in self.booked_ahead:
+                self.booked_ahead[key] &= ~bit
+        self._changed()
+
+    def hold(self, owner, doctor_id, date, times, ttl=None):
+        """
+        Reserve free slots for owner until the TTL runs out.
+
+        Any slots owner was already holding are released first. Times are
+        taken in the order given until the doctor-day has day_hold_limit
+        slots held; returns the times that were free and are now held.
+        """
+        doctor_id = str(doctor_id)
+        expires = monotonic() + (self.hold_ttl if ttl is None else ttl)
+        held = []
+        with self.hold_cond:
+            if self.successor:
+                return self.successor.hold(owner, doctor_id, date, times, ttl)
+            self._release_holds(owner)
+            room = self.day_hold_limit - sum(1 for key in self.holds if key[0] == doctor_id and key[1] == date)
+            for time in times:
+                if len(held) >= room:
+                    break
+                if self.reserve(doctor_id, date, time):
+                    key = (doctor_id, date, time)
+                    self.holds[key] = (owner, expires)
+                    self.owned.setdefault(owner, set()).add(key)
+                    heapq.heappush(self.expiry, (expires, key, owner))
+                    held.append(time)
+            if held:
+                if self.expirer is None:
+                    self.expirer = threading.Thread(target=self._expire_holds, daemon=True)
+                    self.expirer.start()
+                self.hold_cond.notify()
+        return held
+
+    def claim(self, owner, doctor_id, date, time):
+        """
+        Turn owner's hold on a slot into a booking and release its other holds.
+
+        Returns False if owner does not (or no longer) hold the slot.
+        """
+        key = (str(doctor_id), date, time)
+        with self.hold_cond:
+            if self.successor:
+                return self.successor.claim(owner, doctor_id, date, time)
+            claimed = self.holds.get(key, (None,))[0] == owner
+            if claimed:
+                del self.holds[key]
+                self.owned[owner].discard(key)
+            self._release_holds(owner)
+        return claimed
+
+    def release_holds(self, owner):
+        """Give back every slot owner is holding"""
+        with self.hold_cond:
+            if self.successor:
+                return self.successor.release_holds(owner)
+            self._release_holds(owner)
+
+    def _release_holds(self, owner):
+        for key in self.owned.pop(owner, ()):
+            del self.holds[key]
+            self.release(*key)
+
+    def _expire_holds(self):
+        # Sleeps until the earliest hold is due; hold() wakes it for new ones
+        with self.hold_cond:
+            while True:
+                now = monotonic()
+                while self.expiry and self.expiry[0][0] <= now:
+                    expires, key, owner = heapq.heappop(self.expiry)
+                    # Entries for holds already claimed or released are stale
+                    if self.holds.get(key) == (owner, expires):
+                        del self.holds[key]
+                        self.owned[owner].discard(key)
+                        if not self.owned[owner]:
+                            del self.owned[owner]
+                        self.release(*key)
+                self.hold_cond.wait(self.expiry[0][0] - now if self.expiry else None)
+
+    def _changed(self):
+        self.generation = next(self.generations)
+        self.modified = datetime.now(timezone.utc)
+
+    def _lock(self, key):
+        return self.locks[hash(key) % len(self.locks)]
+
+    def _dates_between(self, date_from, date_to):
+        return [date for date in self.dates
+                if (not date_from or date >= date_from) and (not date_to or date <= date_to)]
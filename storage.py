@@ -0,0 +1,827 @@
+import os
+import re
+import sys
+import json
+import time
+import codecs
+import uuid
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict, deque
+from indexes import AppointmentIndex
+from records import AppointmentRecord, as_record
+
+
+JSON_WHITESPACE = re.compile(r'[ \t\r\n]*')
+
+
+class GroupCommitter:
+    """
+    Batch writes from concurrent callers into one durable flush.
+
+    The first caller to arrive becomes the leader: it waits a short window for
+    other writers to queue up, then hands the whole batch to ``flush`` in a
+    single call. Every caller returns only once the batch holding its item has
+    been flushed, and re-raises the error if that flush failed.
+    """
+
+    def __init__(self, flush, window=0.002):
+        self.flush = flush
+        self.window = window
+        self.cond = threading.Condition()
+        self.queue = []
+        self.enqueued = 0
+        self.durable = 0
+        self.flushing = False
+        self.failures = []
+
+    def enqueue(self, item):
+        """Queue an item and return the ticket to wait on"""
+        with self.cond:
+            self.queue.append(item)
+            self.enqueued += 1
+            return self.enqueued
+
+    def commit(self, item):
+        """Queue an item and block until it is durable"""
+        self.wait(self.enqueue(item))
+
+    def wait(self, ticket):
+        """Block until the item with this ticket has been flushed"""
+        with self.cond:
+            while self.durable < ticket and self.flushing:
+                self.cond.wait()
+            if self.durable >= ticket:
+                self._check(ticket)
+                return
+            self.flushing = True
+
+        # This thread leads the next batch
+        time.sleep(self.window)
+        with self.cond:
+            batch, self.queue = self.queue, []
+            upto = self.enqueued
+
+        error = None
+        try:
+            if batch:
+                self.flush(batch)
+        except Exception as e:
+            error = e
+
+        with self.cond:
+            if error is not None:
+                self.failures.append((self.durable, upto, error))
+                del self.failures[:-100]
+            self.durable = upto
+            self.flushing = False
+            self.cond.notify_all()
+
+        if error is not None:
+            raise error
+
+    def done(self, ticket):
+        """Whether the item with this ticket has been flushed; re-raises the error if that flush failed"""
+        with self.cond:
+            if self.durable < ticket:
+                return False
+            self._check(ticket)
+            return True
+
+    def _check(self, ticket):
+        for start, end, error in self.failures:
+            if start < ticket <= end:
+                raise error
+
+
+class SnapshotWriter:
+    """Coalesce concurrent whole-file JSON saves into single atomic writes"""
+
+    def __init__(self, filename, window=0.002):
+        self.filename = filename
+        self.committer = GroupCommitter(self._flush, window)
+
+    def save(self, data):
+        # Copy now so the batch writes what the caller saw, not a list
+        # that is still being mutated by other requests
+        self.committer.commit(list(data) if isinstance(data, list) else dict(data))
+
+    def _flush(self, batch):
+        # Only the most recent state in the batch needs to reach disk
+        write_atomic(self.filename, json.dumps(batch[-1], indent=4).encode())
+
+
+class AppointmentJournal:
+    """
+    Append-only persistence for appointment records.
+
+    Every mutation is written as a single JSON line to a journal file next to
+    the snapshot (appointments.json -> appointments.journal), so the cost of a
+    write no longer depends on how many appointments exist. Once enough entries
+    have accumulated the journal is folded back into the snapshot on a
+    background thread.
+
+    Appends from concurrent requests are group-committed: each caller blocks
+    until its entry is fsynced, but entries arriving together share one write.
+    A change becomes visible only once its entry is durable, and changes are
+    applied in journal order; if the flush fails the change is dropped and
+    the caller gets the error. Lookups are answered from an AppointmentIndex
+    kept in step with the list.
+    """
+
+    # Types of the (date, time, id) keys schedule_page() hands out
+    schedule_key_types = (str, str, str)
+
+    def __init__(self, snapshot_file, journal_file=None, compact_after=500, window=0.002,
+                 resolve_doctor=None):
+        self.snapshot_file = snapshot_file
+        self.resolve_doctor = resolve_doctor or (lambda record: record.get("doctor_id"))
+        self.journal_file = journal_file or os.path.splitext(snapshot_file)[0] + ".journal"
+        self.compact_after = compact_after
+        self.records = []
+        self.index = AppointmentIndex(self.resolve_doctor)
+        self.lock = threading.RLock()
+        self.seq = 0
+        self.applied = 0
+        self.unapplied = deque()
+        self.pending = 0
+        self.compacting = False
+        self._journal = None
+        self.file_lock = threading.Lock()
+        self.committer = GroupCommitter(self._flush, window)
+        self.ready = threading.Event()
+        self.progress = threading.Condition(self.lock)
+        self.unsettled = None
+
+    def load(self, background=False, compact=True):
+        """
+        Load the snapshot and replay any journal entries written after it.
+
+        The snapshot is parsed incrementally and records become visible in
+        batches. With background=True this runs on its own thread and returns
+        the (still filling) records list at once; until loading finishes, id
+        lookups answer as soon as the record is in, while other reads and all
+        writes wait for the load to complete. Records without an id are given
+        one, and unless compact=False the snapshot is rewritten to keep them.
+        """
+        self.ready.clear()
+        if background:
+            threading.Thread(target=self._load, args=(compact,), daemon=True).start()
+        else:
+            self._load(compact)
+        return self.records
+
+    def _load(self, compact=True, batch_size=1000):
+        try:
+            entries = self._read_journal()
+
+            # Records the journal will change can't be served before replay;
+            # entries without ids match by value, so any of those blocks all
+            unsettled = set()
+            for entry in entries:
+                if entry.get("op") in ("remove", "update"):
+                    if "id" not in entry:
+                        unsettled = None
+                        break
+                    unsettled.add(entry["id"])
+            self.unsettled = unsettled
+
+            with self.lock:
+                self.records.clear()
+                self.index.rebuild(self.records)
+            digest = hashlib.sha1()
+            batch = []
+            if os.path.exists(self.snapshot_file):
+                for data in iter_json_array(self.snapshot_file, digest):
+                    batch.append(AppointmentRecord.from_dict(data))
+                    if len(batch) >= batch_size:
+                        self._extend(batch)
+                        batch = []
+            self._extend(batch)
+            digest = digest.hexdigest()
+
+            # If the last compaction finished writing the snapshot but crashed
+            # before trimming the journal, skip the entries it already contains
+            applied_seq = 0
+            for entry in entries:
+                if entry.get("op") == "checkpoint" and entry.get("digest") == digest:
+                    applied_seq = max(applied_seq, entry["seq"])
+
+            with self.lock:
+                for entry in entries:
+                    self.seq = max(self.seq, entry.get("seq", 0))
+                    if entry.get("op") == "checkpoint" or entry.get("seq", 0) <= applied_seq:
+                        continue
+                    self._replay(entry)
+                    self.pending += 1
+                self.applied = self.seq
+
+                # Appointments saved before ids existed get one now, and the snapshot
+                # is rewritten so the ids stay the same across restarts
+                assigned = assign_missing_ids(self.records)
+                if assigned:
+                    self.index.rebuild(self.records)
+            if assigned and compact:
+                self.compact()
+        finally:
+            with self.lock:
+                self.ready.set()
+                self.progress.notify_all()
+
+    def _extend(self, records):
+        with self.lock:
+            self.records.extend(records)
+            for record in records:
+                self.index.add(record)
+            self.progress.notify_all()
+
+    def _read_journal(self):
+        entries = []
+        if not os.path.exists(self.journal_file):
+            return entries
+        with open(self.journal_file, 'r') as file:
+            for line in file:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # A torn final line from an interrupted write is ignored
+                    break
+        return entries
+
+    def _replay(self, entry):
+        op = entry.get("op")
+        if op == "add":
+            record = AppointmentRecord.from_dict(entry["record"])
+            self.records.append(record)
+            self.index.add(record)
+            return
+        if "id" in entry:
+            record = self.index.get(entry["id"])
+        elif op in ("remove", "update"):
+            # Entries written before appointments had ids identify the record by value
+            target = AppointmentRecord.from_dict(entry["record"])
+            record = next((record for record in self.records if record == target), None)
+        else:
+            return
+        if record is None:
+            return
+        if op == "remove":
+            self._remove_from_list(record)
+            self.index.remove(record)
+        elif op == "update":
+            self.index.remove(record)
+            record.update(entry["changes"])
+            self.index.add(record)
+
+    def get(self, appointment_id):
+        """Return the appointment with this id, if any"""
+        with self.lock:
+            record = self.index.get(appointment_id)
+            # While loading, a record that has streamed in is final unless
+            # the journal still has to change it
+            while not self.ready.is_set():
+                unsettled = self.unsettled
+                if record is not None and unsettled is not None and appointment_id not in unsettled:
+                    break
+                self.progress.wait()
+                record = self.index.get(appointment_id)
+            return record
+
+    def find(self, email=None, phone=None):
+        """Return appointments matching the email or the phone number"""
+        self.ready.wait()
+        with self.lock:
+            return self.index.find(email=email, phone=phone)
+
+    def for_doctor(self, doctor_id):
+        """Return all appointments booked with a doctor"""
+        self.ready.wait()
+        with self.lock:
+            return self.index.for_doctor(doctor_id)
+
+    def schedule(self, doctor_id, date_from=None, date_to=None):
+        """Return a doctor's appointments in date order, optionally within a date range"""
+        self.ready.wait()
+        with self.lock:
+            return self.index.schedule(doctor_id, date_from, date_to)
+
+    def schedule_page(self, doctor_id, date_from=None, date_to=None, after=None, limit=50, descending=False):
+        """Return one page of a doctor's schedule and the key to continue from"""
+        self.ready.wait()
+        with self.lock:
+            return self.index.schedule_page(doctor_id, date_from, date_to, after, limit, descending)
+
+    def at(self, index):
+        """Return the appointment at this position in booking order, if any"""
+        self.ready.wait()
+        with self.lock:
+            return self.records[index] if 0 <= index < len(self.records) else None
+
+    def all(self):
+        """Return every appointment in booking order"""
+        self.ready.wait()
+        with self.lock:
+            return list(self.records)
+
+    def add(self, appointment):
+        """Append a new appointment and return its stored record, under a newly minted id"""
+        record = as_record(appointment)
+        self.ready.wait()
+        with self.lock:
+            record["id"] = new_appointment_id()
+            ticket = self._append({"op": "add", "record": record.to_dict()}, lambda: self._insert(record))
+        self._wait(ticket)
+        return record
+
+    def remove(self, record):
+        """Remove an existing appointment"""
+        self.ready.wait()
+        with self.lock:
+            if self.index.get(record["id"]) is not record:
+                raise ValueError("Appointment is not in the store")
+            ticket = self._append({"op": "remove", "id": record["id"]}, lambda: self._delete(record))
+        self._wait(ticket)
+
+    def update(self, record, changes):
+        """Apply field changes to an existing appointment"""
+        self.ready.wait()
+        changes = dict(changes)
+        with self.lock:
+            entry = {"op": "update", "id": record["id"], "changes": changes}
+            ticket = self._append(entry, lambda: self._change(record, changes))
+        self._wait(ticket)
+
+    def _insert(self, record):
+        self.records.append(record)
+        self.index.add(record)
+
+    def _delete(self, record):
+        # An earlier remove in the same batch may have taken it already
+        if self.index.get(record["id"]) is record:
+            self._remove_from_list(record)
+            self.index.remove(record)
+
+    def _change(self, record, changes):
+        if self.index.get(record["id"]) is record:
+            self.index.remove(record)
+            record.update(changes)
+            self.index.add(record)
+
+    def _remove_from_list(self, record):
+        # Match by identity; equal-looking duplicates are separate bookings
+        for i in range(len(self.records) - 1, -1, -1):
+            if self.records[i] is record:
+                del self.records[i]
+                return
+        raise ValueError("Appointment is not in the store")
+
+    def _append(self, entry, apply):
+        # Called with self.lock held so journal order matches seq order;
+        # the caller waits for durability after releasing the lock, and
+        # apply changes the in-memory state once the entry is on disk
+        self.seq += 1
+        entry["seq"] = self.seq
+        ticket = self.committer.enqueue(json.dumps(entry) + "\n")
+        self.unapplied.append((ticket, self.seq, apply))
+        self.pending += 1
+
+        if self.pending >= self.compact_after and not self.compacting:
+            self.compacting = True
+            threading.Thread(target=self.compact, daemon=True).start()
+        return ticket
+
+    def _wait(self, ticket):
+        try:
+            self.committer.wait(ticket)
+        finally:
+            with self.lock:
+                self._apply_durable()
+
+    def _apply_durable(self):
+        # Called with self.lock held. Entries are applied strictly in journal
+        # order, whichever of their writers wakes first
+        while self.unapplied:
+            ticket, seq, apply = self.unapplied[0]
+            try:
+                durable = self.committer.done(ticket)
+            except Exception:
+                # Its flush failed: the writer gets the error and nothing changes
+                durable = None
+            if durable is False:
+                break
+            self.unapplied.popleft()
+            self.applied = seq
+            if durable:
+                apply()
+
+    def _flush(self, lines):
+        with self.file_lock:
+            if self._journal is None:
+                self._journal = open(self.journal_file, 'a')
+            self._journal.write("".join(lines))
+            self._journal.flush()
+            os.fsync(self._journal.fileno())
+
+    def compact(self):
+        """Fold the journal into a fresh snapshot"""
+        try:
+            with self.lock:
+                # Entries not yet applied are kept in the journal after the checkpoint
+                records = [record.to_dict() for record in self.records]
+                seq = self.applied
+
+            data = json.dumps(records, indent=4).encode()
+            digest = hashlib.sha1(data).hexdigest()
+
+            # Record which snapshot covers entries up to seq before replacing it
+            checkpoint = {"op": "checkpoint", "seq": seq, "digest": digest}
+            self.committer.commit(json.dumps(checkpoint) + "\n")
+
+            write_atomic(self.snapshot_file, data)
+
+            # Entries queued but not yet flushed are appended after the
+            # rewrite; the checkpoint makes replay skip any with seq <= seq
+            with self.file_lock:
+                remaining = [entry for entry in self._read_journal()
+                             if entry.get("op") != "checkpoint" and entry.get("seq", 0) > seq]
+                if self._journal is not None:
+                    self._journal.close()
+                    self._journal = None
+                write_atomic(self.journal_file,
+                             "".join(json.dumps(entry) + "\n" for entry in [checkpoint] + remaining).encode())
+            with self.lock:
+                self.pending = self.seq - seq
+        finally:
+            self.compacting = False
+
+
+class SqliteAppointmentStore:
+    """
+    Appointment storage in a local SQLite database.
+
+    Offers the same interface as AppointmentJournal. Rows keep the full record
+    as JSON alongside indexed id, email, phone, doctor and date columns, so
+    lookups are index seeks. Rows are decoded into records only when a query
+    returns them, and the most recently used cache_size records are kept by
+    rowid so repeated lookups return the same object without decoding again.
+    On first use an empty database is seeded from the existing
+    appointments.json.
+    """
+
+    # Types of the (date, time, rowid) keys schedule_page() hands out
+    schedule_key_types = (str, str, int)
+
+    def __init__(self, db_file, import_file=None, resolve_doctor=None, cache_size=4096):
+        self.db_file = db_file
+        self.import_file = import_file
+        self.resolve_doctor = resolve_doctor or (lambda record: record.get("doctor_id"))
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.lock = threading.RLock()
+        self.ready = threading.Event()
+
+        self.conn = sqlite3.connect(db_file, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS appointments (
+                rowid INTEGER PRIMARY KEY,
+                appointment_id TEXT,
+                email TEXT,
+                phone TEXT,
+                doctor_id TEXT,
+                appointment_date TEXT,
+                appointment_time TEXT,
+                data TEXT NOT NULL
+            );
+        """)
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(appointments)")]
+        if "appointment_id" not in columns:
+            # Databases created before ids had their own column
+            self.conn.execute("ALTER TABLE appointments ADD COLUMN appointment_id TEXT")
+        self.conn.executescript("""
+            CREATE INDEX IF NOT EXISTS idx_appointments_id ON appointments (appointment_id);
+            CREATE INDEX IF NOT EXISTS idx_appointments_email ON appointments (email);
+            CREATE INDEX IF NOT EXISTS idx_appointments_phone ON appointments (phone);
+            CREATE INDEX IF NOT EXISTS idx_appointments_doctor
+                ON appointments (doctor_id, appointment_date, appointment_time);
+            CREATE INDEX IF NOT EXISTS idx_appointments_date ON appointments (appointment_date);
+        """)
+        self.conn.commit()
+
+    def load(self, background=False):
+        """
+        Prepare the database, importing the JSON file into an empty one.
+
+        Rows without an appointment id column value are given one. With
+        background=True this runs on a separate thread; queries and writes
+        wait until it has finished.
+        """
+        self.ready.clear()
+        if background:
+            threading.Thread(target=self._load, daemon=True).start()
+        else:
+            self._load()
+
+    def _load(self):
+        try:
+            with self.lock:
+                self.cache.clear()
+                count = self.conn.execute("SELECT COUNT(*) FROM appointments").fetchone()[0]
+                if count == 0 and self.import_file and os.path.exists(self.import_file):
+                    self.import_json(self.import_file)
+
+                # Give rows imported before appointments had ids a permanent
+                # one, and fill the id column of rows from older databases
+                rows = self.conn.execute(
+                    "SELECT rowid, data FROM appointments WHERE appointment_id IS NULL").fetchall()
+                for rowid, data in rows:
+                    record = AppointmentRecord.from_dict(json.loads(data))
+                    assign_missing_ids([record])
+                    self.conn.execute("UPDATE appointments SET appointment_id = ?, data = ? WHERE rowid = ?",
+                                      (record["id"], json.dumps(record.to_dict()), rowid))
+                self.conn.commit()
+        finally:
+            self.ready.set()
+
+    def import_json(self, filename):
+        """
+        Copy the appointments from a JSON snapshot and its journal into the
+        database, giving records without an id a new one. The files are left
+        as they are.
+        """
+        records = AppointmentJournal(filename, resolve_doctor=self.resolve_doctor).load(compact=False)
+        with self.lock:
+            self.conn.executemany(
+                "INSERT INTO appointments (appointment_id, email, phone, doctor_id, appointment_date, "
+                "appointment_time, data) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (self._row(record) for record in records)
+            )
+            self.conn.commit()
+        return len(records)
+
+    def _row(self, record):
+        return (record.get("id") or None, record.get("email"), record.get("phone"), self.resolve_doctor(record),
+                record.get("appointment_date"), record.get("appointment_time"), json.dumps(record.to_dict()))
+
+    def _record(self, rowid, data):
+        # Called with self.lock held
+        record = self.cache.get(rowid)
+        if record is None:
+            record = AppointmentRecord.from_dict(json.loads(data))
+        self._cache(rowid, record)
+        return record
+
+    def _cache(self, rowid, record):
+        self.cache[rowid] = record
+        self.cache.move_to_end(rowid)
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    def _rowid(self, record):
+        row = self.conn.execute("SELECT rowid FROM appointments WHERE appointment_id = ?",
+                                (record["id"],)).fetchone()
+        if row is None:
+            raise ValueError("Appointment is not in the store")
+        return row[0]
+
+    def _fetch(self, query, params):
+        self.ready.wait()
+        with self.lock:
+            return [self._record(rowid, data) for rowid, data in self.conn.execute(query, params)]
+
+    def get(self, appointment_id):
+        """Return the appointment with this id, if any"""
+        records = self._fetch("SELECT rowid, data FROM appointments WHERE appointment_id = ? ORDER BY rowid LIMIT 1",
+                              (appointment_id,))
+        return records[0] if records else None
+
+    def at(self, index):
+        """Return the appointment at this position in booking order, if any"""
+        if index < 0:
+            return None
+        records = self._fetch("SELECT rowid, data FROM appointments ORDER BY rowid LIMIT 1 OFFSET ?", (index,))
+        return records[0] if records else None
+
+    def all(self):
+        """
+        Yield every appointment in booking order.
+
+        Rows are read through a connection of their own, so the whole table
+        is seen as of one moment without holding the store lock, and are
+        decoded one at a time without going through the record cache.
+        """
+        self.ready.wait()
+        conn = sqlite3.connect(self.db_file)
+        try:
+            for (data,) in conn.execute("SELECT data FROM appointments ORDER BY rowid"):
+                yield AppointmentRecord.from_dict(json.loads(data))
+        finally:
+            conn.close()
+
+    def find(self, email=None, phone=None):
+        """Return appointments matching the email or the phone number"""
+        return self._fetch("SELECT rowid, data FROM appointments WHERE email = ? OR phone = ? ORDER BY rowid",
+                           (email or None, phone or None))
+
+    def for_doctor(self, doctor_id):
+        """Return all appointments booked with a doctor"""
+        return self._fetch("SELECT rowid, data FROM appointments WHERE doctor_id = ? ORDER BY rowid", (doctor_id,))
+
+    def schedule(self, doctor_id, date_from=None, date_to=None):
+        """Return a doctor's appointments in date order, optionally within a date range"""
+        return self._fetch(
+            "SELECT rowid, data FROM appointments WHERE doctor_id = ? "
+            "AND appointment_date >= ? AND appointment_date <= ? "
+            "ORDER BY appointment_date, appointment_time, rowid",
+            (doctor_id, date_from or "", date_to or "\uffff")
+        )
+
+    def schedule_page(self, doctor_id, date_from=None, date_to=None, after=None, limit=50, descending=False):
+        """Return one page of a doctor's schedule and the key to continue from"""
+        query = ("SELECT appointment_date, appointment_time, rowid, data FROM appointments WHERE doctor_id = ? "
+                 "AND appointment_date >= ? AND appointment_date <= ?")
+        params = [doctor_id, date_from or "", date_to or "\uffff"]
+        if after is not None:
+            query += " AND (appointment_date, appointment_time, rowid) %s (?, ?, ?)" % ("<" if descending else ">")
+            params.extend(after)
+        direction = "DESC" if descending else "ASC"
+        query += f" ORDER BY appointment_date {direction}, appointment_time {direction}, rowid {direction} LIMIT ?"
+        params.append(limit + 1)
+
+        self.ready.wait()
+        with self.lock:
+            rows = self.conn.execute(query, params).fetchall()
+            page = [self._record(row[2], row[3]) for row in rows[:limit]]
+        next_key = list(rows[limit - 1][:3]) if len(rows) > limit else None
+        return page, next_key
+
+    def add(self, appointment):
+        """Insert a new appointment and return its stored record, under a newly minted id"""
+        record = as_record(appointment)
+        self.ready.wait()
+        with self.lock:
+            record["id"] = new_appointment_id()
+            cursor = self.conn.execute(
+                "INSERT INTO appointments (appointment_id, email, phone, doctor_id, appointment_date, "
+                "appointment_time, data) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                self._row(record)
+            )
+            self.conn.commit()
+            self._cache(cursor.lastrowid, record)
+        return record
+
+    def remove(self, record):
+        """Delete an existing appointment"""
+        self.ready.wait()
+        with self.lock:
+            rowid = self._rowid(record)
+            self.conn.execute("DELETE FROM appointments WHERE rowid = ?", (rowid,))
+            self.conn.commit()
+            self.cache.pop(rowid, None)
+
+    def update(self, record, changes):
+        """Apply field changes to an existing appointment"""
+        self.ready.wait()
+        with self.lock:
+            rowid = self._rowid(record)
+            record.update(changes)
+            self.conn.execute(
+                "UPDATE appointments SET appointment_id = ?, email = ?, phone = ?, doctor_id = ?, "
+                "appointment_date = ?, appointment_time = ?, data = ? WHERE rowid = ?",
+                self._row(record) + (rowid,)
+            )
+            self.conn.commit()
+            self._cache(rowid, record)
+
+
+def new_appointment_id():
+    """Generate a stable unique id for a new appointment"""
+    return str(uuid.uuid4())
+
+
+def assign_missing_ids(records):
+    """Give every record without an id a new one and return those records"""
+    assigned = []
+    for record in records:
+        if not record.get("id"):
+            record["id"] = new_appointment_id()
+            assigned.append(record)
+    return assigned
+
+
+def doctor_resolver(doctors):
+    """Build a function that maps an appointment to its doctor id"""
+    by_display = {f"{doctor['name']} ({doctor['specialty']})": doctor["id"] for doctor in doctors}
+
+    def resolve(record):
+        if record.get("doctor_id"):
+            return record["doctor_id"]
+        display = record.get("doctor") or ""
+        if display in by_display:
+            return by_display[display]
+        # Older records may only carry part of the display string
+        for doctor in doctors:
+            if doctor["name"] in display:
+                return doctor["id"]
+        return None
+
+    return resolve
+
+
+def open_appointment_store(snapshot_file, resolve_doctor=None):
+    """Create the appointment store selected by the APPOINTMENT_STORE setting"""
+    backend = os.getenv("APPOINTMENT_STORE", "json").lower()
+    if backend == "sqlite":
+        db_file = os.getenv("APPOINTMENT_DB", os.path.splitext(snapshot_file)[0] + ".db")
+        return SqliteAppointmentStore(db_file, import_file=snapshot_file, resolve_doctor=resolve_doctor)
+    if backend != "json":
+        raise ValueError(f"Unknown appointment store: {backend}")
+    return AppointmentJournal(snapshot_file, resolve_doctor=resolve_doctor)
+
+
+def iter_json_array(filename, digest=None, chunk_size=1 << 16):
+    """
+    Yield the elements of a JSON array file one at a time.
+
+    The file is read and decoded in chunks, so the first element is available
+    without parsing the whole file. ``digest`` (a hashlib object) is fed every
+    byte of the file. Parsing stops quietly at anything malformed.
+    """
+    decoder = json.JSONDecoder()
+    text = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    pos = 0
+    eof = False
+    opened = False
+    need_more = False
+    with open(filename, 'rb') as file:
+        while True:
+            pos = JSON_WHITESPACE.match(buffer, pos).end()
+            if not eof and (need_more or len(buffer) - pos < chunk_size):
+                # Keep a chunk of lookahead, dropping what has been parsed already
+                chunk = file.read(chunk_size)
+                if digest is not None:
+                    digest.update(chunk)
+                eof = not chunk
+                buffer = buffer[pos:] + text.decode(chunk, final=eof)
+                pos = 0
+                need_more = False
+                continue
+            if pos == len(buffer):
+                break
+
+            if not opened:
+                if buffer[pos] != "[":
+                    break
+                opened = True
+                pos += 1
+            elif buffer[pos] == "]":
+                break
+            elif buffer[pos] == ",":
+                pos += 1
+            else:
+                try:
+                    value, end = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    if eof:
+                        break
+                    need_more = True
+                    continue
+                if end == len(buffer) and not eof:
+                    # A number at the end of the buffer may continue in the next chunk
+                    need_more = True
+                    continue
+                pos = end
+                yield value
+
+        # Hash whatever follows the array too
+        if digest is not None:
+            for chunk in iter(lambda: file.read(chunk_size), b""):
+                digest.update(chunk)
+
+
+def write_atomic(filename, data):
+    """Write bytes to filename via a temp file and rename"""
+    tmp_file = f"{filename}.tmp"
+    with open(tmp_file, 'wb') as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_file, filename)
+
+
+if __name__ == "__main__":
+    # Usage: python storage.py import [appointments.json] [appointments.db]
+    if len(sys.argv) < 2 or sys.argv[1] != "import":
+        print("Usage: python storage.py import [appointments.json] [appointments.db]")
+        sys.exit(1)
+    source = sys.argv[2] if len(sys.argv) > 2 else "appointments.json"
+    target = sys.argv[3] if len(sys.argv) > 3 else os.path.splitext(source)[0] + ".db"
+    with open("doctor.json", 'r') as file:
+        doctors = json.load(file)["doctors"]
+    store = SqliteAppointmentStore(target, resolve_doctor=doctor_resolver(doctors))
+    print(f"Imported {store.import_json(source)} appointments from {source} into {target}")